@@ -4,6 +4,14 @@ module.exports = {
       name: "ednews",
       script: "main.py",
       interpreter: "./venv/bin/python",
-    }
+      // 定时更新交给 ednews-ingest，API 进程只在数据版本文件变化时重建内存索引
+      // WORKERS 按 CPU 核数设置，各 worker 共享列式快照
+      env: { RUN_SCHEDULER: "false", WORKERS: "4" },
+    },
+    {
+      name: "ednews-ingest",
+      script: "ingest.py",
+      interpreter: "./venv/bin/python",
+    },
   ]
 }
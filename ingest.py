@@ -0,0 +1,45 @@
+#独立的数据更新进程：python -m ingest 常驻运行定时任务（同一时间只有一个进程能运行调度，其余的排队等锁）；
+#python -m ingest --once top-headlines 只执行一次更新后退出。API 进程通过数据版本文件得知数据已更新。
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import asyncio
+from routers.newsapi.api import (
+    scheduler, scheduler_lock, SCHEDULER_LOCK_PATH, setup_scheduler, run_exclusive, migrate_datasets,
+    update_top_headline, update_everything, compact_store,
+)
+
+JOBS = {
+    "top-headlines": ("update_top_headline", update_top_headline),
+    "everything": ("update_everything", update_everything),
+    "compact": ("compact_store", compact_store),
+}
+
+
+async def serve():
+    setup_scheduler()
+    # 调度器的任务在 ingest_jobs 的线程里执行，这里只需保持事件循环运行
+    try:
+        await asyncio.Event().wait()
+    finally:
+        scheduler.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--once", choices=list(JOBS), action="append", help="立即执行的更新（可重复），执行完退出")
+    args = parser.parse_args()
+    migrate_datasets()
+
+    if args.once:
+        for job in args.once:
+            run_exclusive(*JOBS[job])
+    else:
+        if not scheduler_lock.acquire(blocking=False):
+            print(f"其他进程正在运行数据更新调度（{SCHEDULER_LOCK_PATH}），等待其退出...")
+            scheduler_lock.acquire()
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
@@ -3,6 +3,7 @@ load_dotenv()
 
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 import uvicorn
 from routers.newsapi.api import router
 from routers.newsapi.location import router as location_router
@@ -10,9 +11,13 @@ from routers.geoserver.exportMap import router as export_router
 from routers.geoserver.layers import router as layers_router
 from routers.newsapi.charts import router as charts_router
 from fastapi.middleware.cors import CORSMiddleware
-from routers.newsapi.api import setup_scheduler
+from routers.newsapi.api import setup_scheduler, reload_derived_indexes, build_snapshots, migrate_datasets
 from routers.newsapi import test_data
+from utils.resources import resources, WARMUP_RESOURCES
+from utils import data_version
+import asyncio
 import os
+import threading
 
 #这一段不要
 #raw_keys = os.getenv("geocoding_api_key")
@@ -21,8 +26,13 @@ import os
 #print("解析后的 API_KEYS =", API_KEYS)
 HOST= os.getenv("host", "127.0.0.1")
 PORT= os.getenv("port", 7000)
+# 生产环境的 worker 进程数；大于 1 时各 worker 共享列式快照，定时更新只在拿到调度锁的一个进程里运行
+WORKERS = int(os.getenv("WORKERS", 1))
+# 由独立的入库进程（python -m ingest）运行定时更新时设为 false
+RUN_SCHEDULER = os.getenv("RUN_SCHEDULER", "true").lower() == "true"
 
-app = FastAPI()
+# 所有接口默认用 orjson 序列化
+app = FastAPI(default_response_class=ORJSONResponse)
 
 #跨域请求设置
 app.add_middleware(
@@ -33,9 +43,11 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有头部
 )
 
-from fastapi.staticfiles import StaticFiles
+# 响应压缩（gzip，安装了 brotli 时优先 br）；/data 下有预压缩版本时直接发送
+from utils.compression import CompressionMiddleware, PrecompressedStaticFiles
 import os
-app.mount("/data", StaticFiles(directory=os.path.join(os.path.dirname(__file__), "data")), name="data")
+app.add_middleware(CompressionMiddleware)
+app.mount("/data", PrecompressedStaticFiles(directory=os.path.join(os.path.dirname(__file__), "data")), name="data")
 
 @app.get("/")
 async def read_root():
@@ -57,7 +69,21 @@ app.include_router(layers_router, prefix="/geoserver", tags=["图层管理"])
 
 @app.on_event("startup")
 async def startup_event():
-    setup_scheduler()
+    # 旧 JSON 在这里迁移为分段（多个 worker 同时调用时由文件锁排队），读接口不再触发迁移
+    migrate_datasets()
+    if RUN_SCHEDULER:
+        setup_scheduler()
+    # 其他进程写入数据后通过版本文件通知本进程
+    app.state.data_version_watcher = asyncio.create_task(data_version.watch(reload_derived_indexes))
+    # WARMUP_RESOURCES 里的资源在后台线程初始化，不耽误开始接收请求
+    if WARMUP_RESOURCES:
+        threading.Thread(target=resources.warmup, name="warmup", daemon=True).start()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host=HOST, port=PORT)
+    if WORKERS > 1:
+        # 先把快照生成好，worker 启动后直接映射，不必各自解析数据（快照带数据版本，与入库进程同时写也不会用错）
+        migrate_datasets()
+        build_snapshots()
+        uvicorn.run("main:app", host=HOST, port=int(PORT), workers=WORKERS)
+    else:
+        uvicorn.run(app, host=HOST, port=int(PORT))
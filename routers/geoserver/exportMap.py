@@ -8,14 +8,22 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import json
 import tempfile
 import os
 import time
+from utils.browser_pool import browser_pool
+from utils.export_store import export_store, request_key, is_valid_key
+from utils.jobs import JobManager
+from utils.raster_render import render_map_image
+from utils.tile_cache import TILE_SOURCES
+from urllib.parse import quote
 
 router = APIRouter()
 
@@ -57,17 +65,29 @@ class ExportMapRequest(BaseModel):
     height: int = 768
     articles: List[Article]  # 替换 points
     basemap_type: str = "OpenStreetMap"
+    # browser: 无头浏览器截取 folium 地图；raster: 服务端用 Pillow 直接拼瓦片绘制，不启动浏览器
+    render_mode: str = "browser"
+
+RENDER_MODES = ("browser", "raster")
+
+# 本服务瓦片接口的地址（如 http://127.0.0.1:7000/geoserver/tiles），配置后浏览器导出也通过本地瓦片缓存取瓦片
+TILE_PROXY_URL = os.getenv("TILE_PROXY_URL")
 
 def create_folium_map(request: ExportMapRequest) -> folium.Map:
     tiles_mapping = {
         # 保持不变
     }
     tiles = tiles_mapping.get(request.basemap_type, "OpenStreetMap")
+    attr = None
+    if TILE_PROXY_URL and request.basemap_type in TILE_SOURCES:
+        tiles = f"{TILE_PROXY_URL.rstrip('/')}/{quote(request.basemap_type)}/{{z}}/{{x}}/{{y}}.png"
+        attr = request.basemap_type
 
     m = folium.Map(
         location=[request.center_lat, request.center_lng],
         zoom_start=request.zoom,
         tiles=tiles,
+        attr=attr,
         width=request.width,
         height=request.height
     )
@@ -115,43 +135,80 @@ def articles_to_geojson(articles: List[Article]) -> Dict[str, Any]:
         "features": features
     }
 
-def capture_map_image(folium_map: folium.Map, width: int, height: int) -> str:
-    """使用undetected_chromedriver截取地图图片并返回base64编码"""
-    import undetected_chromedriver as uc
-    
-    driver = None
+# 等待地图上所有瓦片图层加载完成（Leaflet 的 load 事件），取代固定的 sleep。
+# 同时关闭瓦片的淡入效果，load 之后再等两帧保证已经绘制到屏幕上。
+WAIT_FOR_TILES_JS = """
+var mapName = arguments[0];
+var done = arguments[arguments.length - 1];
+var style = document.createElement('style');
+style.textContent = '.leaflet-tile { opacity: 1 !important; transition: none !important; }';
+document.head.appendChild(style);
+function painted() {
+    requestAnimationFrame(function () { requestAnimationFrame(function () { done(true); }); });
+}
+var map = window[mapName];
+if (!map) { painted(); return; }
+var pending = [];
+map.eachLayer(function (layer) {
+    if (layer instanceof L.GridLayer && (layer.isLoading ? layer.isLoading() : layer._loading)) {
+        pending.push(layer);
+    }
+});
+if (!pending.length) { painted(); return; }
+var left = pending.length;
+pending.forEach(function (layer) {
+    layer.once('load', function () { if (--left === 0) { painted(); } });
+});
+"""
+EXPORT_TILE_TIMEOUT = float(os.getenv("EXPORT_TILE_TIMEOUT", 15))
+
+def wait_for_tiles(driver, map_name: str):
+    driver.set_script_timeout(EXPORT_TILE_TIMEOUT)
+    try:
+        driver.execute_async_script(WAIT_FOR_TILES_JS, map_name)
+    except TimeoutException:
+        print(f"等待瓦片加载超过 {EXPORT_TILE_TIMEOUT} 秒，使用当前画面截图")
+
+def image_to_png(image: Image.Image) -> bytes:
+    img_buffer = io.BytesIO()
+    image.save(img_buffer, format='PNG')
+    return img_buffer.getvalue()
+
+def image_to_base64(image: Image.Image) -> str:
+    return base64.b64encode(image_to_png(image)).decode('utf-8')
+
+def render_raster_image(request: ExportMapRequest, geojson_data: Dict[str, Any]) -> Image.Image:
+    """不经过浏览器，直接按 GeoJSON 中的点位绘制地图"""
+    points = [feature["geometry"]["coordinates"] for feature in geojson_data["features"]]
+    return render_map_image(
+        request.center_lat, request.center_lng, request.zoom,
+        request.width, request.height, points, basemap=request.basemap_type,
+    )
+
+def capture_map_image(folium_map: folium.Map, width: int, height: int) -> Image.Image:
+    """从浏览器池借一个常驻的无头浏览器截取地图图片；池满等待超时抛出 TimeoutError"""
     temp_file = None
     
     try:
-        # 使用undetected_chromedriver自动匹配Chrome版本
-        options = uc.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument(f"--window-size={width},{height}")
-        
-        driver = uc.Chrome(options=options)
-        
-        # 设置窗口大小
-        driver.set_window_size(width, height)
-        
         # 保存folium地图为临时HTML文件
         with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False) as f:
             temp_file = f.name
             folium_map.save(f.name)
-        
-        # 加载HTML文件
-        driver.get(f"file://{temp_file}")
-        
-        # 等待地图加载完成
-        wait = WebDriverWait(driver, 30)
-        wait.until(EC.presence_of_element_located((By.CLASS_NAME, "leaflet-container")))
-        
-        # 额外等待确保瓦片加载完成
-        time.sleep(3)
-        
-        # 截图
-        screenshot = driver.get_screenshot_as_png()
+
+        with browser_pool.session() as driver:
+            # 设置窗口大小
+            driver.set_window_size(width, height)
+
+            # 加载HTML文件
+            driver.get(f"file://{temp_file}")
+
+            # 等待地图容器出现，再等待瓦片加载完成
+            wait = WebDriverWait(driver, 30)
+            wait.until(EC.presence_of_element_located((By.CLASS_NAME, "leaflet-container")))
+            wait_for_tiles(driver, folium_map.get_name())
+
+            # 截图
+            screenshot = driver.get_screenshot_as_png()
         
         # 转换为PIL Image并调整大小
         image = Image.open(io.BytesIO(screenshot))
@@ -160,69 +217,134 @@ def capture_map_image(folium_map: folium.Map, width: int, height: int) -> str:
                 image = image.resize((width, height), Image.Resampling.LANCZOS)
             except AttributeError:
                 image = image.resize((width, height), Image.LANCZOS)
-        
-          # 转换为base64之前，先保存图片到本地
-        image = Image.open(io.BytesIO(screenshot))
-        if image.size != (width, height):
-            try:
-                image = image.resize((width, height), Image.Resampling.LANCZOS)
-            except AttributeError:
-                image = image.resize((width, height), Image.LANCZOS)
-        
-        # 保存图片到本地
-        output_path = "test_output.png"  # 图片将保存在项目根目录
-        image.save(output_path)
-        print(f"图片已保存到: {output_path}")
-        
-        # 转换为base64
-        img_buffer = io.BytesIO()
-        image.save(img_buffer, format='PNG')
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-        
-        return img_base64
-        
-    except Exception as e:
-        import traceback
-        error_details = str(e) + "\n" + traceback.format_exc()
-        raise HTTPException(status_code=500, detail=f"截图失败: {error_details}")
+        return image
     
     finally:
-        # 清理资源
-        if driver:
-            driver.quit()
+        # 清理临时文件（浏览器归还给池，不在这里关闭）
         if temp_file and os.path.exists(temp_file):
             os.unlink(temp_file)
 
+def render_export_image(request: ExportMapRequest) -> Image.Image:
+    if request.render_mode == "raster":
+        return render_raster_image(request, articles_to_geojson(request.articles))
+    return capture_map_image(create_folium_map(request), request.width, request.height)
+
+def validate_export_request(request: ExportMapRequest):
+    if not (-90 <= request.center_lat <= 90):
+        raise HTTPException(status_code=400, detail="纬度必须在-90到90之间")
+
+    if not (-180 <= request.center_lng <= 180):
+        raise HTTPException(status_code=400, detail="经度必须在-180到180之间")
+
+    if not (1 <= request.zoom <= 18):
+        raise HTTPException(status_code=400, detail="缩放级别必须在1到18之间")
+
+    if request.width <= 0 or request.height <= 0:
+        raise HTTPException(status_code=400, detail="图片尺寸必须大于0")
+
+    if request.render_mode not in RENDER_MODES:
+        raise HTTPException(status_code=400, detail=f"render_mode 必须是 {', '.join(RENDER_MODES)} 之一")
+
+# 导出任务队列：渲染在线程池里进行，不占用事件循环；结果按请求哈希存盘，相同请求只渲染一次
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 2))
+export_jobs = JobManager(max_workers=EXPORT_WORKERS, name="export", keep=200)
+
+def export_key(request: ExportMapRequest) -> str:
+    return request_key(json.dumps(request.dict(), sort_keys=True, ensure_ascii=False))
+
+def run_export_job(request: ExportMapRequest, key: str):
+    start = time.perf_counter()
+    export_store.save(key, image_to_png(render_export_image(request)))
+    print(f"地图导出完成 {key[:12]}（{request.render_mode}，{time.perf_counter() - start:.2f}s）")
+
+# 任务表里导出任务的名称为 "export:<导出结果 id>"
+EXPORT_JOB_PREFIX = "export:"
+
+def export_view(job: dict) -> dict:
+    """任务记录 -> 对外的导出状态：id 统一用导出结果 id（请求哈希），不暴露任务表内部的 id"""
+    return {**job, "id": job["name"][len(EXPORT_JOB_PREFIX):]}
+
+def submit_export(request: ExportMapRequest):
+    """提交导出任务，返回 (导出结果 id, 任务记录)；已有未过期的结果时任务记录为 None，同一请求正在渲染时复用那个任务"""
+    key = export_key(request)
+    if export_store.get(key):
+        return key, None
+    return key, export_jobs.submit(EXPORT_JOB_PREFIX + key, run_export_job, request, key)
+
+def export_status(key: str):
+    """导出结果 id -> 任务状态；任务记录被清理（或服务重启）后，只要结果文件还在就算成功"""
+    job = export_jobs.find(EXPORT_JOB_PREFIX + key)
+    if job and job["status"] != "succeeded":
+        return export_view(job)
+    if export_store.get(key):
+        return {**(export_view(job) if job else {}), "id": key, "status": "succeeded"}
+    if job:
+        return {**export_view(job), "status": "expired"}
+    return None
+
+def with_image_url(http_request: Request, status: dict) -> dict:
+    if status["status"] == "succeeded":
+        status["image_url"] = str(http_request.url_for("get_export_image", job_id=status["id"]))
+    return status
+
 @router.post("/export", response_model=ExportMapResponse)
 async def export_map(request: ExportMapRequest):
-    try:
-        # 参数验证
-        if not (-90 <= request.center_lat <= 90):
-            raise HTTPException(status_code=400, detail="纬度必须在-90到90之间")
-        
-        if not (-180 <= request.center_lng <= 180):
-            raise HTTPException(status_code=400, detail="经度必须在-180到180之间")
-        
-        if not (1 <= request.zoom <= 18):
-            raise HTTPException(status_code=400, detail="缩放级别必须在1到18之间")
-        
-        if request.width <= 0 or request.height <= 0:
-            raise HTTPException(status_code=400, detail="图片尺寸必须大于0")
-        
-        # 创建folium地图
-        folium_map = create_folium_map(request)
-        image_base64 = capture_map_image(folium_map, request.width, request.height)
-        geojson_data = articles_to_geojson(request.articles)
-
-        return ExportMapResponse(
-            success=True,
-            image_base64=image_base64,
-            message=f"成功导出地图，包含{len(request.articles)}条新闻",
-            geojson=geojson_data )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"导出地图失败: {str(e)}")
+    """同步导出（兼容旧接口）：任务排进导出队列，等它完成后返回 base64 图片"""
+    validate_export_request(request)
+    geojson_data = articles_to_geojson(request.articles)
+    key, job = submit_export(request)
+    if job is not None:
+        try:
+            # 同一请求可能正由其他 worker 渲染，wait 会轮询共享的任务状态
+            await export_jobs.wait(job["id"])
+        except TimeoutError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"导出地图失败: {str(e)}")
+
+    path = export_store.get(key)
+    if path is None:
+        raise HTTPException(status_code=500, detail="导出地图失败: 结果文件不存在")
+    with open(path, "rb") as f:
+        image_base64 = base64.b64encode(f.read()).decode('utf-8')
+
+    return ExportMapResponse(
+        success=True,
+        image_base64=image_base64,
+        message=f"成功导出地图，包含{len(request.articles)}条新闻",
+        geojson=geojson_data )
+
+@router.post("/export/jobs", status_code=202)
+async def submit_export_job(request: ExportMapRequest, http_request: Request):
+    """提交导出任务，立即返回任务 id；用 GET /export/jobs/{id} 查询进度"""
+    validate_export_request(request)
+    key, job = submit_export(request)
+    status = export_view(job) if job else {"id": key, "status": "succeeded"}
+    return with_image_url(http_request, status)
+
+@router.get("/export/jobs")
+async def list_export_jobs():
+    """最近的导出任务，id 与 GET /export/jobs/{id} 使用的相同"""
+    return [export_view(job) for job in export_jobs.list()]
+
+@router.get("/export/jobs/{job_id}")
+async def get_export_job(job_id: str, http_request: Request):
+    """查询导出任务状态，成功时附带图片地址"""
+    status = export_status(job_id) if is_valid_key(job_id) else None
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Export job {job_id} not found")
+    return with_image_url(http_request, status)
+
+@router.get("/export/jobs/{job_id}/image")
+async def get_export_image(job_id: str):
+    """直接返回导出的 PNG"""
+    path = export_store.get(job_id) if is_valid_key(job_id) else None
+    if path is None:
+        status = export_status(job_id) if is_valid_key(job_id) else None
+        if status and status["status"] in ("queued", "running"):
+            raise HTTPException(status_code=409, detail="导出任务尚未完成")
+        raise HTTPException(status_code=404, detail=f"Export image {job_id} not found")
+    return FileResponse(path, media_type="image/png", filename=f"map-{job_id[:12]}.png")
     
 
 #这些用不到。。。
@@ -248,6 +370,11 @@ async def test_export():
     
     return await export_map(test_request)
 
+@router.get("/export/browser-pool")
+async def get_browser_pool_stats():
+    """导出用浏览器池的状态"""
+    return browser_pool.stats()
+
 @router.get("/basemap-types")
 async def get_basemap_types():
     """
@@ -1,6 +1,9 @@
 #示例，如果导出图片用到geoserver或是数据存储用到数据库，这个接口就不必要。
 import requests
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Optional
+from utils.tile_cache import tile_cache, register_source
+from utils.vector_tiles import vector_tiles, NEWS_LAYER
 router = APIRouter()
 
 GEOSERVER_URL = "http://localhost:8080/geoserver/rest/"
@@ -38,6 +41,29 @@ basemap_configs = [
     },
 ]
 
+# GeoServer 底图按 WMTS GetTile（KVP）方式注册到瓦片缓存，行列号与 XYZ 一致（EPSG:900913 网格）
+for config in basemap_configs:
+    register_source(
+        config["name"],
+        f"{config['service_url']}?SERVICE=WMTS&REQUEST=GetTile&VERSION=1.0.0"
+        f"&LAYER={config['workspace']}:{config['layer_name']}&STYLE=&TILEMATRIXSET=EPSG:900913"
+        "&TILEMATRIX=EPSG:900913:{z}&TILEROW={y}&TILECOL={x}&FORMAT=image/png",
+    )
+
+# 叠加在底图上的数据图层，前端按瓦片分页加载
+overlay_configs = [
+    {
+        "name": NEWS_LAYER,
+        "title": "新闻地点",
+        "type": "vector",
+        "format": "mvt",
+        "source_layer": NEWS_LAYER,
+        "url": "/geoserver/vector/news/{z}/{x}/{y}.mvt",
+        "min_zoom": 0,
+        "max_zoom": 22,
+    },
+]
+
 @router.get("/basemaps")
 async def get_basemaps():
     """
@@ -46,6 +72,14 @@ async def get_basemaps():
     return basemap_configs
 
 
+@router.get("/overlays")
+async def get_overlays():
+    """
+    返回数据叠加图层配置（矢量瓦片），与底图配置一起供前端使用
+    """
+    return overlay_configs
+
+
 @router.get("/layers")
 async def get_layers():
     """
@@ -57,3 +91,38 @@ async def get_layers():
         return resp.json()
     else:
         raise HTTPException(status_code=resp.status_code, detail="获取GeoServer图层失败")
+
+
+@router.get("/tiles/stats")
+async def get_tile_cache_stats():
+    """瓦片缓存的命中率与占用空间"""
+    return tile_cache.stats()
+
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}.png")
+def get_tile(layer: str, z: int, x: int, y: int):
+    """经本地瓦片缓存返回底图瓦片，缓存未命中时从上游获取"""
+    content = tile_cache.get(layer, z, x, y)
+    if content is None:
+        raise HTTPException(status_code=404, detail="瓦片不存在或上游不可用")
+    return Response(content=content, media_type="image/png", headers={"Cache-Control": "public, max-age=86400"})
+
+
+@router.get("/vector/stats")
+async def get_vector_tile_stats():
+    """矢量瓦片缓存的命中率"""
+    return vector_tiles.stats()
+
+
+@router.get("/vector/{layer}/{z}/{x}/{y}.mvt")
+def get_vector_tile(layer: str, z: int, x: int, y: int,
+                    category: Optional[str] = Query(None, description="新闻分类，不填为全部")):
+    """新闻地点的 Mapbox Vector Tile，瓦片内的点按网格抽稀，属性含 count 和最新一篇文章的 article_id"""
+    if layer != NEWS_LAYER:
+        raise HTTPException(status_code=404, detail=f"未知的矢量图层: {layer}")
+    if not (0 <= z <= 22 and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        raise HTTPException(status_code=400, detail="瓦片坐标超出范围")
+    content = vector_tiles.get_tile(z, x, y, category)
+    if not content:
+        return Response(status_code=204)
+    return Response(content=content, media_type="application/vnd.mapbox-vector-tile")
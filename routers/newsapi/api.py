@@ -2,9 +2,13 @@ import os
 import json
 import ast
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
+import requests
+from requests.adapters import HTTPAdapter
 from newsapi.newsapi_client import NewsApiClient
 from random import randrange
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -12,6 +16,20 @@ from apscheduler.triggers.cron import CronTrigger
 import atexit
 from dotenv import load_dotenv
 from utils.utiles import add_location_info
+from utils.geocode_cache import geocode_cache
+from utils.gazetteer import gazetteer
+from utils.jobs import JobManager
+from utils.article_index import article_index
+from utils.article_store import append_articles, compact_folder, migrate_legacy_folder
+from utils.catalog import catalog
+from utils.chart_aggregates import chart_aggregates
+from utils.point_clusters import cluster_index
+from utils.vector_tiles import vector_tiles
+from utils.resources import resources
+from utils.file_lock import FileLock
+from utils import data_version
+from utils.columnar import snapshots
+from utils.filters import category_files
 
 load_dotenv()
 router = APIRouter()
@@ -26,71 +44,217 @@ CATEGORIES = [
 ]
 SOURCES = ["bbc.co.uk", "cnn.com", "foxnews.com", "google.com"]
 
-API_KEYS = os.getenv("API_KEYS").split(',')
-print("解析后的apikey=",API_KEYS)
-LAST_KEY_INDEX = randrange(0, len(API_KEYS))
+def load_newsapi_keys():
+    raw_keys = os.getenv("API_KEYS")
+    if not raw_keys:
+        raise ValueError("⚠️ 没有找到 API_KEYS，请确认 .env 已正确加载")
+    api_keys = raw_keys.split(',')
+    print("解析后的apikey=", api_keys)
+    return api_keys
+
+# 只读模式的进程不抓取新闻，不需要 key
+resources.register("newsapi_keys", load_newsapi_keys, ingest=True)
+LAST_KEY_INDEX = None
+_key_lock = threading.Lock()
+
+# 同时进行的 NewsAPI 请求数
+NEWSAPI_CONCURRENCY = int(os.getenv("NEWSAPI_CONCURRENCY", 8))
+
+# 所有抓取线程共用一个 Session，连接池大小与并发数一致，跨多次更新复用连接
+newsapi_session = requests.Session()
+newsapi_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=NEWSAPI_CONCURRENCY))
 
 def get_key():
     global LAST_KEY_INDEX
-    LAST_KEY_INDEX = (LAST_KEY_INDEX + 1) % len(API_KEYS)
-    return API_KEYS[LAST_KEY_INDEX]
+    api_keys = resources.get("newsapi_keys")
+    with _key_lock:
+        if LAST_KEY_INDEX is None:
+            LAST_KEY_INDEX = randrange(0, len(api_keys))
+        LAST_KEY_INDEX = (LAST_KEY_INDEX + 1) % len(api_keys)
+        return api_keys[LAST_KEY_INDEX]
 
-def save_to_json(filename, new_content):
-    filtered_articles = add_location_info(new_content['articles'])
+def get_newsapi_client():
+    return NewsApiClient(api_key=get_key(), session=newsapi_session)
+
+def save_to_json(filename, new_content, category=None):
+    # 已经处理过的文章直接跳过，不再做地名识别和地理编码
+    new_articles = article_index.filter_new(filename, new_content['articles'])
+    print(f"{len(new_articles)} of {len(new_content['articles'])} articles are new for {filename}.")
+    if not new_articles:
+        return
+
+    filtered_articles, unresolved = add_location_info(new_articles)
+    # 地理编码临时失败、没能保存的文章不登记，下次入库时重新处理；其余的（已保存或确定没有地点）都登记
+    unresolved_ids = set(map(id, unresolved))
+    processed = [article for article in new_articles if id(article) not in unresolved_ids]
+    if unresolved:
+        print(f"{len(unresolved)} articles could not be geocoded (temporary errors), will retry on the next update.")
 
     if not filtered_articles:
+        article_index.add(filename, processed)
         print("No articles with location found, nothing to save.")
         return
 
-    data = {"status": "ok", "totalResults": 0, "articles": []}
+    # 只追加新文章到按日期分段的 NDJSON，不再读出并重写整个文件
+    append_articles(filename, filtered_articles)
+    catalog.invalidate(filename)
+    if category:
+        chart_aggregates.record(category, filtered_articles)
+        cluster_index.add(category, filtered_articles)
+        vector_tiles.add(category, filtered_articles)
+    article_index.add(filename, processed)
+    print(f"Saved {len(filtered_articles)} articles with location to {filename}.")
+
+def top_headline_queries():
+    """去重后的 (category, country, language) 查询列表"""
+    return list(dict.fromkeys(
+        (category, country, language)
+        for category in CATEGORIES
+        for country, language in COUNTRIES_LANGUAGES.items()
+    ))
 
-    if os.path.exists(filename):
-        with open(filename, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                print(f"{filename} is empty or corrupted, reinitializing.")
+def fetch_top_headlines(category, country, language):
+    return get_newsapi_client().get_top_headlines(
+        category=category, country=country, language=language, page_size=100
+    )
 
-    data["articles"].extend(filtered_articles)
-    data["totalResults"] = len(data["articles"])
+def fetch_everything(source):
+    return get_newsapi_client().get_everything(
+        sources=source,
+        from_param=(datetime.now() - timedelta(hours=12, minutes=30)).date().isoformat(),
+        language='en',
+        sort_by='publishedAt',
+        page_size=100
+    )
 
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-    print(f"Saved {len(filtered_articles)} articles with location to {filename}.")
+def fan_out(fetch, queries):
+    """并发执行抓取，按完成顺序逐个产出 (query, 结果)，失败的查询打印后跳过"""
+    with ThreadPoolExecutor(max_workers=NEWSAPI_CONCURRENCY, thread_name_prefix="newsapi") as pool:
+        futures = {pool.submit(fetch, *query): query for query in queries}
+        for future in as_completed(futures):
+            query = futures[future]
+            try:
+                yield query, future.result()
+            except Exception as e:
+                print(f"Fetching {query} failed: {e}")
 
 def update_top_headline():
-    for category in CATEGORIES:
-        for country in COUNTRIES_LANGUAGES:
-            print(f"Started updating category: {category} country: {country} at: {time.strftime('%A, %d. %B %Y %I:%M:%S %p')}")
-            newsapi = NewsApiClient(api_key=get_key())
-            top_headlines = newsapi.get_top_headlines(category=category, page_size=100)
-            save_to_json(f"data/top-headlines/category/{category}.json", top_headlines)
+    queries = top_headline_queries()
+    print(f"Started updating {len(queries)} top headline queries at: {time.strftime('%A, %d. %B %Y %I:%M:%S %p')}")
+    # 抓取结果一到就进入地名识别和保存，不必等所有请求结束
+    for (category, country, language), top_headlines in fan_out(fetch_top_headlines, queries):
+        print(f"Fetched category: {category} country: {country} language: {language}")
+        save_to_json(f"data/top-headlines/category/{category}.json", top_headlines, category=category)
     print("Top headlines updated.")
+    print("Gazetteer stats:", gazetteer.stats())
+    print("Geocode cache stats:", geocode_cache.stats())
 
 def update_everything():
-    newsapi = NewsApiClient(api_key=get_key())
-    for source in SOURCES:
-        print(f"Started updating source: {source} at: {time.strftime('%A, %d. %B %Y %I:%M:%S %p')}")
-        all_articles = newsapi.get_everything(
-            sources=source,
-            from_param=(datetime.now() - timedelta(hours=12, minutes=30)).date().isoformat(),
-            language='en',
-            sort_by='publishedAt',
-            page_size=100
-        )
+    print(f"Started updating {len(SOURCES)} sources at: {time.strftime('%A, %d. %B %Y %I:%M:%S %p')}")
+    for (source,), all_articles in fan_out(fetch_everything, [(source,) for source in SOURCES]):
+        print(f"Fetched source: {source}")
         save_to_json(f"data/everything/{source}.json", all_articles)
     print("Everything updated.")
 
-@router.get("/top-headlines/update")
+# 数据更新（NewsAPI 请求、地名识别、地理编码）都是同步阻塞的，统一放到后台线程里执行，
+# 单线程保证本进程同一时间只有一个更新任务在写文件
+ingest_jobs = JobManager(max_workers=1, name="ingest")
+
+# 跨进程：写数据期间持有 ingest 锁；运行定时调度的进程一直持有 scheduler 锁，保证只有一个调度器
+INGEST_LOCK_PATH = os.getenv("INGEST_LOCK_PATH", "data/.ingest.lock")
+SCHEDULER_LOCK_PATH = os.getenv("SCHEDULER_LOCK_PATH", "data/.scheduler.lock")
+ingest_lock = FileLock(INGEST_LOCK_PATH)
+scheduler_lock = FileLock(SCHEDULER_LOCK_PATH)
+
+def migrate_datasets():
+    """把还是旧整文件 JSON 的数据迁移为分段；在开始接收请求之前调用，读接口本身不做迁移"""
+    migrate_legacy_folder("data/top-headlines/category")
+    migrate_legacy_folder("data/everything")
+
+def build_snapshots():
+    """重新生成数据有变化的类别的列式快照，API worker 直接映射它们"""
+    try:
+        snapshots.build(category_files())
+    except Exception as e:
+        print(f"生成列式快照失败: {e}")
+
+def run_exclusive(reason, fn):
+    """其他进程（独立的入库进程或别的 API worker）正在写数据时排队等待，写完后改写数据版本文件通知它们"""
+    with ingest_lock:
+        try:
+            fn()
+        finally:
+            build_snapshots()
+            data_version.bump(reason)
+
+def reload_derived_indexes(info):
+    """其他进程写入了数据：聚类和矢量瓦片的内存索引作废，下次查询时按新数据重建"""
+    print(f"数据已由进程 {info.get('pid')} 更新（{info.get('reason')}），重建聚类与矢量瓦片索引。")
+    cluster_index.invalidate()
+    vector_tiles.invalidate()
+
+def ensure_writable():
+    if resources.read_only:
+        raise HTTPException(status_code=403, detail="只读模式下不执行数据更新")
+
+def submit_update_top_headline():
+    return ingest_jobs.submit("update_top_headline", run_exclusive, "update_top_headline", update_top_headline)
+
+def submit_update_everything():
+    return ingest_jobs.submit("update_everything", run_exclusive, "update_everything", update_everything)
+
+def compact_store():
+    """去重、排序各分段，并重新生成 data 目录下的整文件 JSON 快照"""
+    compact_folder("data/top-headlines/category")
+    compact_folder("data/everything")
+    catalog.invalidate()
+    # 压缩会去掉重复文章，预聚合计数随之重建
+    chart_aggregates.rebuild()
+    cluster_index.invalidate()
+    vector_tiles.invalidate()
+
+def submit_compact_store():
+    return ingest_jobs.submit("compact_store", run_exclusive, "compact_store", compact_store)
+
+@router.get("/top-headlines/update", status_code=202)
 async def update_top_headline_api():
-    update_top_headline()
-    return {"status": "updated"}
+    ensure_writable()
+    job = submit_update_top_headline()
+    return {"status": job["status"], "job_id": job["id"]}
 
-@router.get("/everything/update")
+@router.get("/everything/update", status_code=202)
 async def update_everything_api():
-    update_everything()
-    return {"status": "updated"}
+    ensure_writable()
+    job = submit_update_everything()
+    return {"status": job["status"], "job_id": job["id"]}
+
+@router.get("/jobs")
+async def list_jobs():
+    """最近的数据更新任务"""
+    return ingest_jobs.list()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询数据更新任务的状态"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.get("/geocode/cache/stats")
+async def geocode_cache_stats():
+    """地理编码缓存的命中/未命中计数"""
+    return geocode_cache.stats()
+
+@router.get("/geocode/gazetteer/stats")
+async def gazetteer_stats():
+    """离线地名表的规模与命中/未命中计数"""
+    return gazetteer.stats()
+
+@router.get("/resources")
+async def resource_stats():
+    """spaCy 模型、地理编码客户端等资源是否已加载及加载用时"""
+    return resources.stats()
 
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -102,17 +266,29 @@ scheduler = AsyncIOScheduler()
 INTERVAL = 1  # 每隔多少分钟执行一次
 
 # 注册任务（注意：不调用 .start()）
-def setup_scheduler():
+def setup_scheduler(wait=False):
+    """拿到 scheduler 锁才启动调度；wait=True 时一直等到持有锁的进程退出。返回本进程是否在运行调度"""
+    if resources.read_only:
+        print("只读模式，不启动数据更新调度。")
+        return False
+    if not scheduler_lock.held and not scheduler_lock.acquire(blocking=wait):
+        print(f"数据更新调度已在其他进程中运行（{SCHEDULER_LOCK_PATH}），本进程不启动。")
+        return False
     # 避免重复注册任务
     if not scheduler.running:
         # 自动按时间间隔更新脚本，不用则注释掉
-        # scheduler.add_job(update_everything, trigger="interval", minutes=INTERVAL)
-        # scheduler.add_job(update_top_headline, trigger="interval", minutes=INTERVAL)
+        # scheduler.add_job(submit_update_everything, trigger="interval", minutes=INTERVAL)
+        # scheduler.add_job(submit_update_top_headline, trigger="interval", minutes=INTERVAL)
 
-        # 每天 5:00 运行
-        scheduler.add_job(update_top_headline, trigger=CronTrigger(hour=5, minute=0))
-        scheduler.add_job(update_everything, trigger=CronTrigger(hour=5, minute=0))
+        # 每天 5:00 运行；调度器只负责提交任务，实际更新在 ingest_jobs 的线程里进行
+        scheduler.add_job(submit_update_top_headline, trigger=CronTrigger(hour=5, minute=0))
+        scheduler.add_job(submit_update_everything, trigger=CronTrigger(hour=5, minute=0))
+        # 更新任务排在同一个线程里，压缩任务会在它们之后执行
+        scheduler.add_job(submit_compact_store, trigger=CronTrigger(hour=5, minute=1))
 
         scheduler.start()
         print("Scheduler started.")
-        atexit.register(lambda: scheduler.shutdown())
\ No newline at end of file
+        # 事件循环里已经关闭过调度器时（如 python -m ingest 收到 Ctrl+C）不再重复关闭
+        atexit.register(lambda: scheduler.running and scheduler.shutdown())
+        atexit.register(ingest_jobs.shutdown)
+    return True
@@ -1,98 +1,11 @@
-import json
-import os
-from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-import geopandas as gpd
-from shapely.geometry import Point
+from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from utils.chart_aggregates import chart_aggregates
+from utils.filters import parse_utc
 
 router = APIRouter()
 
-# --------------------- 数据模型 ---------------------
-
-class Location(BaseModel):
-    location: str
-    lat: float
-    lng: float
-
-class Source(BaseModel):
-    id: Optional[str]
-    name: str
-
-class NewsItem(BaseModel):
-    source: Source
-    author: Optional[str]
-    title: str
-    description: Optional[str]
-    url: str
-    urlToImage: Optional[str]
-    publishedAt: str
-    content: Optional[str]
-    location: List[Location] = Field(default_factory=list)
-
-# --------------------- 加载国家边界 ---------------------
-
-def load_country_shapes(data_dir: str = "charts_data") -> gpd.GeoDataFrame:
-    """加载国家行政区划shp数据"""
-    try:
-        countries_file = os.path.join(data_dir, "countries.shp")
-        if not os.path.exists(countries_file):
-            raise FileNotFoundError(f"国家shp文件不存在: {countries_file}")
-        
-        gdf = gpd.read_file(countries_file)
-        
-        # 转为 WGS84 坐标系
-        if gdf.crs is None:
-            gdf = gdf.set_crs(epsg=4326)
-        else:
-            gdf = gdf.to_crs(epsg=4326)
-        
-        return gdf
-    except Exception as e:
-        print(f"加载国家shp数据时出错: {e}")
-        raise
-
-# --------------------- 读取新闻数据 ---------------------
-
-def load_news_from_folder(folder_path: str = "data/top-headlines/category/") -> List[NewsItem]:
-    """从指定文件夹读取 JSON 文件中的新闻数据"""
-    news_items = []
-
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".json"):
-            filepath = os.path.join(folder_path, filename)
-            with open(filepath, "r", encoding="utf-8") as f:
-                try:
-                    raw_json = json.load(f)
-                    articles = raw_json.get("articles", [])
-                    for item in articles:
-                        item.setdefault("location", [])
-                        item.setdefault("source", {"id": None, "name": "Unknown"})
-                        item.setdefault("title", "")
-                        item.setdefault("url", "")
-                        item.setdefault("publishedAt", "")
-                        news_items.append(NewsItem(**item))
-                except Exception as e:
-                    print(f"[错误] 解析文件 {filename} 失败: {e}")
-    
-    return news_items
-
-# --------------------- 统计国家新闻数量 ---------------------
-
-def count_news_by_country(news_items: List[NewsItem], countries_gdf: gpd.GeoDataFrame) -> Dict[str, int]:
-    """根据经纬度统计每个国家的新闻数量"""
-    country_counts = {}
-
-    for news in news_items:
-        for loc in news.location:
-            point = Point(loc.lng, loc.lat)
-            country_match = countries_gdf[countries_gdf.contains(point)]
-            if not country_match.empty:
-                country_name = country_match.iloc[0].get("NAME", country_match.iloc[0].get("COUNTRY", "未知国家"))
-                country_counts[country_name] = country_counts.get(country_name, 0) + 1
-
-    return country_counts
-
 # --------------------- 生成 ECharts 图表配置 ---------------------
 
 def generate_echarts_bar_chart(counts: Dict[str, int]) -> Dict[str, Any]:
@@ -155,14 +68,28 @@ def generate_echarts_bar_chart(counts: Dict[str, int]) -> Dict[str, Any]:
 
 # --------------------- API 路由 ---------------------
 
-@router.get("/news-by-country", response_model=Dict[str, Any])
-async def get_news_by_country_chart():
-    """从本地 JSON 文件读取新闻并生成按国家分布图表"""
+def to_utc_day(time_str: Optional[str]) -> Optional[str]:
+    """ISO 时间字符串转成 UTC 日期（YYYY-MM-DD），与预聚合桶的粒度一致；带时区的先换算到 UTC，不带的按 UTC 处理"""
+    if not time_str:
+        return None
+    try:
+        return parse_utc(time_str).date().isoformat()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"时间格式错误: {e}")
+
+@router.get("/news-by-country", response_class=ORJSONResponse)
+async def get_news_by_country_chart(
+    category: Optional[str] = Query(None, description="新闻分类，不传则统计全部类别"),
+    start_time: Optional[str] = Query(None, description="开始时间 ISO 格式；按 UTC 日期统计，范围扩展到开始时间所在 UTC 日的 00:00"),
+    end_time: Optional[str] = Query(None, description="结束时间 ISO 格式；按 UTC 日期统计，范围扩展到结束时间所在 UTC 日的 24:00")
+):
+    """对入库时预聚合的 国家 × 类别 × 日期 计数求和，生成按国家分布图表"""
+    start_day = to_utc_day(start_time)
+    end_day = to_utc_day(end_time)
     try:
-        countries_gdf = load_country_shapes()
-        news_items = load_news_from_folder()
-        country_counts = count_news_by_country(news_items, countries_gdf)
+        country_counts = chart_aggregates.query(category, start_day, end_day)
         chart_data = generate_echarts_bar_chart(country_counts)
-        return chart_data
+        # 直接返回响应，跳过 response_model 校验和 jsonable_encoder
+        return ORJSONResponse(chart_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"生成图表时出错: {str(e)}")
@@ -1,25 +1,25 @@
 #根据调用新闻标题，提取出其中的地点信息，并返回其经纬度信息至前端以供渲染实体点。
-from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone
 import os
 import json
-import spacy
-from spacy.pipeline import EntityRuler
 import requests
 from pydantic import BaseModel
-from utils.filters import filter_by_category, filter_by_time, filter_all_by_time,filter_recent_days
+from utils.filters import filter_by_category, filter_by_time, filter_all_by_time,filter_recent_days, parse_bbox, category_files, selection_window
+from utils.article_store import dataset_exists
+from utils.columnar import snapshots
+from utils.geojson import iter_features, stream_feature_collection, stream_ndjson
+from utils.point_clusters import cluster_index
+from utils.http_cache import dataset_etag, is_fresh, not_modified, CACHE_HEADERS
+from utils.json_response import articles_response, selections_response
 from typing import List, Optional
 import ast
 
 router = APIRouter()
 
-@router.get("/articles/with-location")
-async def get_articles_with_location(
-    category: Optional[str] = Query(None, description="新闻分类"),
-    start_time: Optional[str] = Query(None, description="开始时间 ISO 格式"),
-    end_time: Optional[str] = Query(None, description="结束时间 ISO 格式")
-):
+def select_articles(category: Optional[str], start_time: Optional[str], end_time: Optional[str]):
+    """按类别/时间筛选文章，参数组合与 /articles/with-location 相同"""
     # 先获取筛选结果
     if category and start_time and end_time:
         try:
@@ -42,9 +42,133 @@ async def get_articles_with_location(
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    articles = data.get("articles", [])
+    return data.get("articles", [])
+
+def select_from_snapshots(category: Optional[str], start_time: Optional[str], end_time: Optional[str], with_location=False):
+    """与 select_articles 相同的筛选，直接在各 worker 共享的列式快照上完成；
+    有数据文件没有最新快照（或参数有误，需要走原来的报错）时返回 None"""
+    try:
+        filenames, start_ts, end_ts = selection_window(category, start_time, end_time)
+    except ValueError:
+        return None
+    selections = []
+    for filename in filenames:
+        if not dataset_exists(filename):
+            if category:
+                return None
+            continue
+        snapshot = snapshots.get(filename)
+        if snapshot is None:
+            return None
+        selections.append(snapshot.time_range(start_ts, end_ts, with_location=with_location))
+    return selections
+
+def selection_etag(request: Request, category, start_time, end_time, articles=None, selections=None):
+    """start_time/end_time 都给出时结果只取决于数据文件版本；否则窗口随当前时间移动，需要结合结果本身"""
+    relative = not (start_time and end_time)
+    if not relative:
+        return dataset_etag(request, category_files(category))
+    if selections is not None:
+        published = b"\n".join(selection.published() for selection in selections if selection.count)
+        return dataset_etag(request, category_files(category), published=published)
+    if articles is None:
+        return None
+    return dataset_etag(request, category_files(category), articles)
+
+@router.get("/articles/with-location")
+async def get_articles_with_location(
+    request: Request,
+    category: Optional[str] = Query(None, description="新闻分类"),
+    start_time: Optional[str] = Query(None, description="开始时间 ISO 格式"),
+    end_time: Optional[str] = Query(None, description="结束时间 ISO 格式")
+):
+    # 数据文件没变时在筛选之前就可以返回 304
+    etag = selection_etag(request, category, start_time, end_time)
+    if etag and is_fresh(request, etag):
+        return not_modified(etag)
+
+    selections = select_from_snapshots(category, start_time, end_time, with_location=True)
+    if selections is not None:
+        if etag is None:
+            etag = selection_etag(request, category, start_time, end_time, selections=selections)
+            if is_fresh(request, etag):
+                return not_modified(etag)
+        return selections_response(
+            selections, headers={"ETag": etag, **CACHE_HEADERS},
+            totalResults=sum(selection.count for selection in selections),
+        )
+
+    articles = select_articles(category, start_time, end_time)
 
     # 只保留带有location字段的文章（说明之前已识别并赋值）
     articles_with_location = [article for article in articles if "location" in article and article["location"]]
 
-    return JSONResponse(content={"totalResults": len(articles_with_location), "articles": articles_with_location})
\ No newline at end of file
+    if etag is None:
+        etag = selection_etag(request, category, start_time, end_time, articles_with_location)
+        if is_fresh(request, etag):
+            return not_modified(etag)
+    return articles_response(
+        articles_with_location, headers={"ETag": etag, **CACHE_HEADERS}, totalResults=len(articles_with_location)
+    )
+
+@router.get("/articles/geojson")
+def get_articles_geojson(
+    request: Request,
+    category: Optional[str] = Query(None, description="新闻分类"),
+    start_time: Optional[str] = Query(None, description="开始时间 ISO 格式"),
+    end_time: Optional[str] = Query(None, description="结束时间 ISO 格式"),
+    bbox: Optional[str] = Query(None, description="范围 minLng,minLat,maxLng,maxLat"),
+    format: str = Query("geojson", description="geojson: FeatureCollection；ndjson: 每行一个 Feature"),
+):
+    """以 GeoJSON 分块流式返回文章地点，每个地点一个 Point Feature"""
+    if format not in ("geojson", "ndjson"):
+        raise HTTPException(status_code=400, detail="format 必须是 geojson 或 ndjson")
+    try:
+        bbox_value = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    etag = selection_etag(request, category, start_time, end_time)
+    if etag and is_fresh(request, etag):
+        return not_modified(etag)
+    articles = select_articles(category, start_time, end_time)
+    if etag is None:
+        etag = selection_etag(request, category, start_time, end_time, articles)
+        if is_fresh(request, etag):
+            return not_modified(etag)
+
+    headers = {"ETag": etag, **CACHE_HEADERS}
+    features = iter_features(articles, bbox_value)
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(features), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(stream_feature_collection(features), media_type="application/geo+json", headers=headers)
+
+@router.get("/clusters")
+def get_location_clusters(
+    bbox: str = Query(..., description="视野范围 minLng,minLat,maxLng,maxLat"),
+    zoom: int = Query(..., ge=0, le=22, description="地图缩放级别"),
+    category: Optional[str] = Query(None, description="新闻分类，不填为全部"),
+):
+    """视野内的地点聚类（GeoJSON），每个聚类带点数和几篇代表文章的 id"""
+    try:
+        bbox_value = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        clusters = cluster_index.query(bbox_value, zoom, category)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [cluster["lng"], cluster["lat"]]},
+            "properties": {
+                "cluster_id": cluster["id"],
+                "point_count": cluster["count"],
+                "article_ids": cluster["article_ids"],
+            },
+        }
+        for cluster in clusters
+    ]
+    return {"type": "FeatureCollection", "features": features}
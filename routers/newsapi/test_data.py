@@ -1,8 +1,11 @@
-import json
-import os
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from typing import List
 from pydantic import BaseModel
+from utils.article_store import dataset_exists, list_datasets
+from utils.catalog import catalog
+from utils.http_cache import dataset_etag, is_fresh, not_modified, CACHE_HEADERS
+from utils.json_response import articles_response, selections_response
+from utils.columnar import snapshots
 
 router = APIRouter()
 
@@ -12,16 +15,28 @@ class NewsResponse(BaseModel):
     pass
 
 @router.get("/category/{category}")
-async def get_test_data(category: str):
-    """获取测试数据"""
+async def get_test_data(category: str, request: Request):
+    """获取测试数据；数据文件没有变化时按 If-None-Match 返回 304"""
     try:
         file_path = f"data/top-headlines/category/{category}.json"
-        if not os.path.exists(file_path):
+        if not dataset_exists(file_path):
             raise HTTPException(status_code=404, detail=f"Category {category} not found")
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
+
+        etag = dataset_etag(request, [file_path])
+        if is_fresh(request, etag):
+            return not_modified(etag)
+        headers = {"ETag": etag, **CACHE_HEADERS}
+        # 有最新的列式快照时直接切片，不用在本进程解析数据
+        snapshot = snapshots.get(file_path)
+        if snapshot is not None:
+            selection = snapshot.all()
+            return selections_response([selection], headers=headers, status="ok", totalResults=selection.count)
+        articles = catalog.load_articles(file_path)
+        return articles_response(
+            articles, headers=headers, status="ok", totalResults=len(articles)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -30,8 +45,6 @@ async def get_available_categories():
     """获取所有可用的新闻类别"""
     try:
         categories_dir = "data/top-headlines/category"
-        categories = [f.split('.')[0] for f in os.listdir(categories_dir) 
-                     if f.endswith('.json') and not f.endswith('.sample')]
-        return list(set(categories))  # 去重
+        return list_datasets(categories_dir)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
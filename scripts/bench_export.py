@@ -0,0 +1,92 @@
+#地图导出基准：Pillow 栅格渲染与无头浏览器截图的耗时对比。
+#用法（在项目根目录）: python -m scripts.bench_export --runs 20 [--browser] [--tile-dir data/tiles]
+#不指定 --tile-dir 时生成一套纯色的临时瓦片并以离线模式运行，不访问网络。
+import argparse
+import glob
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from PIL import Image
+
+
+def make_synthetic_tiles(tile_dir, basemap, zoom):
+    """生成某一缩放级别的全部纯色瓦片（zoom 不宜过大）"""
+    for x in range(2 ** zoom):
+        for y in range(2 ** zoom):
+            path = os.path.join(tile_dir, basemap.replace(" ", "_"), str(zoom), str(x), f"{y}.png")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            Image.new("RGB", (256, 256), ((x * 40) % 256, (y * 40) % 256, 200)).save(path)
+
+
+def load_sample_articles(pattern="data/top-headlines/category/*.json*"):
+    articles = []
+    for filepath in sorted(glob.glob(pattern)):
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[跳过] {filepath}: {e}")
+            continue
+        for item in data.get("articles", []):
+            if item.get("location"):
+                articles.append({**item, "id": len(articles)})
+    return articles
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+    print(f"{name}: p50 {statistics.median(samples) * 1000:.0f}ms  p90 {p90 * 1000:.0f}ms  (n={len(samples)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--zoom", type=int, default=3)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=768)
+    parser.add_argument("--tile-dir", default=None)
+    parser.add_argument("--browser", action="store_true", help="同时测试无头浏览器截图（需要本机安装 Chrome）")
+    args = parser.parse_args()
+
+    if args.tile_dir:
+        os.environ["TILE_CACHE_DIR"] = args.tile_dir
+    else:
+        tile_dir = tempfile.mkdtemp(prefix="bench_tiles_")
+        make_synthetic_tiles(tile_dir, "OpenStreetMap", args.zoom)
+        os.environ["TILE_CACHE_DIR"] = tile_dir
+        os.environ["TILE_CACHE_OFFLINE"] = "true"
+
+    # 环境变量需要在导入导出模块之前设置好
+    from routers.geoserver.exportMap import (
+        ExportMapRequest, articles_to_geojson, render_raster_image, create_folium_map, capture_map_image, image_to_png,
+    )
+    from utils.tile_cache import tile_cache
+
+    articles = load_sample_articles()
+    request = ExportMapRequest(
+        center_lat=30, center_lng=110, zoom=args.zoom, width=args.width, height=args.height,
+        articles=articles, basemap_type="OpenStreetMap", render_mode="raster",
+    )
+    geojson_data = articles_to_geojson(request.articles)
+    print(f"文章数: {len(articles)}，点数: {len(geojson_data['features'])}")
+
+    report("raster (Pillow)", timed(lambda: image_to_png(render_raster_image(request, geojson_data)), args.runs))
+    print("瓦片缓存:", tile_cache.stats())
+
+    if args.browser:
+        def browser_export():
+            image_to_png(capture_map_image(create_folium_map(request), request.width, request.height))
+        report("browser (selenium)", timed(browser_export, args.runs))
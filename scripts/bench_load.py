@@ -0,0 +1,137 @@
+#读接口压测：按不同的 worker 数启动服务（python main.py，WORKERS=n），多个客户端进程并发请求，输出吞吐与延迟。
+#用法（在项目根目录）: python -m scripts.bench_load --workers 1 2 4 --clients 4 --concurrency 32 --duration 15
+#压测已经在运行的服务: python -m scripts.bench_load --url http://127.0.0.1:7000
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/news/test/category/business",
+    "/news/locations/articles/with-location?category=business",
+]
+
+
+async def _client(url, paths, concurrency, duration, headers):
+    latencies = []
+    errors = 0
+    received = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, headers=headers, timeout=60) as client:
+        async def worker(i):
+            nonlocal errors, received
+            n = i
+            while time.perf_counter() < deadline:
+                path = paths[n % len(paths)]
+                n += 1
+                start = time.perf_counter()
+                try:
+                    resp = await client.get(path)
+                    body = resp.content
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if resp.status_code != 200:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+                received += len(body)
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, errors, received
+
+
+def run_client(args):
+    return asyncio.run(_client(*args))
+
+
+def load(url, paths, clients, concurrency, duration, gzip):
+    headers = {"Accept-Encoding": "gzip" if gzip else "identity"}
+    per_client = max(1, concurrency // clients)
+    with Pool(clients) as pool:
+        results = pool.map(run_client, [(url, paths, per_client, duration, headers)] * clients)
+    latencies = sorted(l for result in results for l in result[0])
+    errors = sum(result[1] for result in results)
+    received = sum(result[2] for result in results)
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / duration,
+        "mb_per_s": received / duration / 1024 / 1024,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def start_server(workers, port):
+    env = {**os.environ, "WORKERS": str(workers), "host": "127.0.0.1", "port": str(port), "RUN_SCHEDULER": "false"}
+    proc = subprocess.Popen([sys.executable, "main.py"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"服务启动失败（WORKERS={workers}），退出码 {proc.returncode}")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit(f"服务在 120 秒内没有就绪（WORKERS={workers}）")
+
+
+def report(label, result):
+    if not result["requests"]:
+        print(f"{label:<14} 没有成功的请求，错误 {result['errors']}")
+        return
+    print(
+        f"{label:<14} {result['rps']:8.1f} req/s  {result['mb_per_s']:8.1f} MB/s  "
+        f"p50 {result['p50_ms']:7.1f}ms  p99 {result['p99_ms']:7.1f}ms  错误 {result['errors']}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="依次测试的 worker 数")
+    parser.add_argument("--url", help="压测已经在运行的服务，不再自行启动")
+    parser.add_argument("--path", action="append", help="请求的路径（可重复），默认类别数据与带地点的文章")
+    parser.add_argument("--clients", type=int, default=4, help="客户端进程数，避免压测端成为瓶颈")
+    parser.add_argument("--concurrency", type=int, default=32, help="所有客户端合计的并发请求数")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--port", type=int, default=7100)
+    parser.add_argument("--gzip", action="store_true", help="请求压缩的响应（默认不压缩，只测接口本身）")
+    args = parser.parse_args()
+    paths = args.path or DEFAULT_PATHS
+
+    print(f"CPU 核数: {os.cpu_count()}  路径: {', '.join(paths)}")
+    if args.url:
+        report("外部服务", load(args.url, paths, args.clients, args.concurrency, args.duration, args.gzip))
+        raise SystemExit
+
+    baseline = None
+    for workers in args.workers:
+        proc, url = start_server(workers, args.port)
+        try:
+            # 预热：每个路径先请求几次，快照映射和首次加载不计入结果
+            for path in paths:
+                for _ in range(workers * 2):
+                    httpx.get(url + path, headers={"Accept-Encoding": "identity"}, timeout=60)
+            result = load(url, paths, args.clients, args.concurrency, args.duration, args.gzip)
+        finally:
+            proc.terminate()
+            proc.wait()
+        label = f"WORKERS={workers}"
+        report(label, result)
+        if result["requests"]:
+            baseline = baseline or result["rps"]
+            print(f"{'':<14} 相对 {args.workers[0]} 个 worker: {result['rps'] / baseline:.2f}x")
@@ -0,0 +1,70 @@
+#地名识别基准：逐篇 nlp(text) 与 nlp.pipe 批量（只跑 entity_ruler + ner）的吞吐对比。
+#用法（在项目根目录）: python -m scripts.bench_ner --articles 700 --batch-size 64 --n-process 1
+import argparse
+import glob
+import json
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.utiles import get_nlp, extract_location_names, LOCATION_LABELS
+
+
+def load_sample_texts(pattern="data/top-headlines/category/*.json*"):
+    texts = []
+    for filepath in sorted(glob.glob(pattern)):
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[跳过] {filepath}: {e}")
+            continue
+        for article in data.get("articles", []):
+            text = f"{article.get('title', '')} {article.get('description', '')}".strip()
+            if text:
+                texts.append(text)
+    return texts
+
+
+def bench_per_article(texts):
+    nlp = get_nlp()
+    start = time.perf_counter()
+    results = [
+        set(ent.text for ent in nlp(text).ents if ent.label_ in LOCATION_LABELS)
+        for text in texts
+    ]
+    return time.perf_counter() - start, results
+
+
+def bench_batched(texts, batch_size, n_process):
+    start = time.perf_counter()
+    results = extract_location_names(texts, batch_size=batch_size, n_process=n_process)
+    return time.perf_counter() - start, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=700, help="参与测试的文章数（样例不足时循环补齐）")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    texts = load_sample_texts()
+    if not texts:
+        raise SystemExit("没有找到样例新闻数据")
+    texts = (texts * (args.articles // len(texts) + 1))[:args.articles]
+
+    # 预热，避免把模型首次调用的开销算进去
+    get_nlp()(texts[0])
+
+    before, before_results = bench_per_article(texts)
+    after, after_results = bench_batched(texts, args.batch_size, args.n_process)
+
+    print(f"文章数: {len(texts)}")
+    print(f"逐篇 nlp(text):     {before:.2f}s  {len(texts) / before:.1f} articles/sec")
+    print(f"批量 nlp.pipe:      {after:.2f}s  {len(texts) / after:.1f} articles/sec")
+    print(f"加速比: {before / after:.1f}x")
+    mismatched = sum(1 for a, b in zip(before_results, after_results) if a != b)
+    print(f"识别结果不一致的文章数: {mismatched}")
@@ -0,0 +1,77 @@
+#文章响应序列化基准：标准库 json / jsonable_encoder 与 orjson、预编码字节拼接的耗时对比。
+#用法（在项目根目录）: python -m scripts.bench_serialize --repeat 50 --runs 10
+import argparse
+import glob
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import orjson
+
+from utils.article_store import append_articles
+from utils.catalog import catalog
+from utils.json_response import articles_body
+
+
+def load_sample_articles(pattern="data/top-headlines/category/*.json*"):
+    articles = []
+    for filepath in sorted(glob.glob(pattern)):
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[跳过] {filepath}: {e}")
+            continue
+        articles.extend(data.get("articles", []))
+    return articles
+
+
+def timed(fn, runs):
+    samples = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def report(name, seconds, size=None):
+    extra = f"  {size / 1024 / 1024:.1f}MB" if size is not None else ""
+    print(f"{name:<36} p50 {seconds * 1000:8.1f}ms{extra}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50, help="样例文章重复的次数，用来模拟更大的数据量")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = load_sample_articles()
+    # 每份副本的 URL 不同，模拟不同的文章
+    articles = [
+        {**article, "url": f"{article.get('url') or ''}#{i}"}
+        for i in range(args.repeat)
+        for article in samples
+    ]
+
+    # 写进临时存储再经目录读出，得到带预编码字节的文章
+    store = os.path.join(tempfile.mkdtemp(prefix="bench_store_"), "bench.json")
+    append_articles(store, articles)
+    articles = catalog.load_articles(store)
+    content = {"totalResults": len(articles), "articles": articles}
+    print(f"文章数: {len(articles)}")
+
+    seconds, body = timed(lambda: JSONResponse(content=content).body, args.runs)
+    report("json (JSONResponse)", seconds, len(body))
+    seconds, body = timed(lambda: JSONResponse(content=jsonable_encoder(content)).body, args.runs)
+    report("jsonable_encoder + json", seconds, len(body))
+    seconds, body = timed(lambda: orjson.dumps(content), args.runs)
+    report("orjson", seconds, len(body))
+    seconds, body = timed(lambda: articles_body(articles, totalResults=len(articles)), args.runs)
+    report("预编码字节拼接", seconds, len(body))
+    assert orjson.loads(body) == orjson.loads(orjson.dumps(content))
@@ -0,0 +1,117 @@
+#文章去重索引：按 URL 和内容哈希记录已经处理过的文章，更新时在地名识别之前就把重复文章剔除。
+import os
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+ARTICLE_INDEX_PATH = os.getenv("ARTICLE_INDEX_PATH", "data/article_index.sqlite3")
+
+
+def normalize_url(url: str) -> str:
+    """去掉跟踪参数和锚点，统一大小写，使同一篇文章的不同链接形式得到相同的结果"""
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.lower().startswith("utm_")]
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path.rstrip("/"),
+        urlencode(query),
+        "",
+    ))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def article_id(article: dict) -> str:
+    """文章的稳定标识：优先用规范化后的 URL，没有 URL 时用标题 + 来源"""
+    url = article.get("url")
+    if url:
+        return _digest("url:" + normalize_url(url))
+    return content_key(article)
+
+
+def content_key(article: dict) -> str:
+    source = article.get("source") or {}
+    title = " ".join((article.get("title") or "").lower().split())
+    return _digest(f"content:{title}|{(source.get('name') or '').lower()}")
+
+
+def article_keys(article: dict):
+    """用来判重的键：URL 相同或标题 + 来源相同都算重复"""
+    keys = {content_key(article)}
+    if article.get("url"):
+        keys.add(article_id(article))
+    return keys
+
+
+class ArticleIndex:
+    """每个数据文件（scope）各自维护一份已处理文章的键集合"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen (scope TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (scope, key))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS scopes (scope TEXT PRIMARY KEY)")
+
+    def _ensure_scope(self, scope: str):
+        """第一次用到某个数据文件时，把文件里已有的文章登记进索引"""
+        if self._conn.execute("SELECT 1 FROM scopes WHERE scope = ?", (scope,)).fetchone():
+            return
+        # 存储模块依赖本模块的 article_id，这里延迟导入避免循环引用
+        from utils.article_store import load_articles
+        try:
+            existing = load_articles(scope)
+        except Exception as e:
+            # 读不出已有文章时不登记这个数据文件，否则修复后已有的文章会被当成新文章重复入库
+            print(f"建立去重索引时读取 {scope} 失败: {e}")
+            raise
+        self._insert(scope, existing)
+        self._conn.execute("INSERT OR IGNORE INTO scopes (scope) VALUES (?)", (scope,))
+        self._conn.commit()
+        print(f"去重索引已登记 {scope} 中的 {len(existing)} 篇文章")
+
+    def _insert(self, scope, articles):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO seen (scope, key) VALUES (?, ?)",
+            [(scope, key) for article in articles for key in article_keys(article)],
+        )
+
+    def filter_new(self, scope: str, articles):
+        """返回未处理过的文章（同一批里重复的也只保留第一篇），不修改索引"""
+        scope = os.path.normpath(scope)
+        new_articles = []
+        batch_keys = set()
+        with self._lock:
+            self._ensure_scope(scope)
+            for article in articles:
+                keys = article_keys(article)
+                if keys & batch_keys:
+                    continue
+                placeholders = ",".join("?" * len(keys))
+                if self._conn.execute(
+                    f"SELECT 1 FROM seen WHERE scope = ? AND key IN ({placeholders}) LIMIT 1",
+                    (scope, *keys),
+                ).fetchone():
+                    continue
+                batch_keys |= keys
+                new_articles.append(article)
+        return new_articles
+
+    def add(self, scope: str, articles):
+        """登记已处理的文章（包括没有识别出地点、未保存的文章，避免下次重复识别）"""
+        scope = os.path.normpath(scope)
+        with self._lock:
+            self._ensure_scope(scope)
+            self._insert(scope, articles)
+            self._conn.commit()
+
+
+article_index = ArticleIndex(ARTICLE_INDEX_PATH)
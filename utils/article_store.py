@@ -0,0 +1,237 @@
+#文章存储：每个数据文件对应一个目录，按发布日期（UTC）分段，每篇文章一行 NDJSON，只追加不重写。
+#  data/top-headlines/category/business.json  ->  data/top-headlines/category/business/2025-06-05.ndjson
+#原来的整文件 JSON 只作为压缩任务生成的快照保留（供 /data 静态目录和旧的读取方式使用）。
+import os
+import json
+import shutil
+import orjson
+import threading
+from datetime import datetime, timezone
+from utils.article_index import article_id
+from utils.compression import write_precompressed
+from utils.file_lock import FileLock
+
+SEGMENT_SUFFIX = ".ndjson"
+# 没有 publishedAt 的文章放在这个分段里
+UNDATED_SEGMENT = "undated"
+
+# 迁移会被读取路径触发，用可重入锁让写入路径里嵌套调用迁移也没问题
+_write_lock = threading.RLock()
+
+
+def dataset_dir(filename: str) -> str:
+    """数据文件路径（xxx.json）对应的分段目录"""
+    return os.path.splitext(filename)[0]
+
+
+def parse_published_at(article: dict):
+    """publishedAt 转成 UTC 的 datetime，缺失或格式错误返回 None"""
+    pub_time = article.get("publishedAt")
+    if not pub_time:
+        return None
+    try:
+        return datetime.fromisoformat(pub_time.replace("Z", "+00:00")).astimezone(timezone.utc)
+    except Exception:
+        return None
+
+
+def segment_day(article: dict) -> str:
+    pub_time = parse_published_at(article)
+    return pub_time.date().isoformat() if pub_time else UNDATED_SEGMENT
+
+
+def list_segments(filename: str):
+    """返回 [(日期, 分段路径)]，按日期排序"""
+    directory = dataset_dir(filename)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        (name[:-len(SEGMENT_SUFFIX)], os.path.join(directory, name))
+        for name in os.listdir(directory)
+        if name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def read_segment(path: str):
+    """逐行读取分段；写到一半的残行（进程崩溃导致）直接跳过"""
+    articles = []
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                articles.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                print(f"跳过损坏的行: {path}")
+    return articles
+
+
+def index_segment(articles):
+    """按发布时间排序，返回 (时间戳升序列表, 对应的文章列表)，没有有效时间的文章不进索引"""
+    entries = []
+    for article in articles:
+        pub_time = parse_published_at(article)
+        if pub_time is not None:
+            entries.append((pub_time.timestamp(), article))
+    entries.sort(key=lambda entry: entry[0])
+    return [ts for ts, _ in entries], [article for _, article in entries]
+
+
+def segment_time_range(day: str):
+    """分段覆盖的时间范围 [start, end)，undated 分段返回 None"""
+    if day == UNDATED_SEGMENT:
+        return None
+    try:
+        start = datetime.fromisoformat(day).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+    return start, start + 86400
+
+
+def _group_by_day(articles):
+    groups = {}
+    for article in articles:
+        groups.setdefault(segment_day(article), []).append(article)
+    return groups
+
+
+def _encode(articles) -> str:
+    return "".join(json.dumps(article, ensure_ascii=False) + "\n" for article in articles)
+
+
+def _write_atomic(path: str, text: str):
+    """先写临时文件再 os.replace，读者要么看到旧文件要么看到完整的新文件"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def migrate_legacy(filename: str):
+    """把旧的整文件 JSON 拆成分段；分段目录整体生成后再改名，迁移中途失败不会留下半个目录。
+    多个 worker 启动时会同时调用，用文件锁保证只有一个进程迁移，其余的等它完成后直接读分段"""
+    directory = dataset_dir(filename)
+    if os.path.isdir(directory) or not os.path.isfile(filename):
+        return
+    with _write_lock, FileLock(directory + ".migrating.lock"):
+        if not os.path.isdir(directory):
+            _migrate(filename, directory)
+
+
+def _migrate(filename: str, directory: str):
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            articles = json.load(f).get("articles", [])
+    except Exception as e:
+        # 不把损坏的文件当成空数据：原文件不动、不建分段，该数据文件的读取和写入都会报错，等待人工修复
+        raise ValueError(f"{filename} 无法解析，未迁移为分段，请人工修复: {e}") from e
+
+    tmp_dir = directory + ".migrating"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for day, day_articles in _group_by_day(articles).items():
+        _write_atomic(os.path.join(tmp_dir, day + SEGMENT_SUFFIX), _encode(day_articles))
+    os.replace(tmp_dir, directory)
+    print(f"已将 {filename} 的 {len(articles)} 篇文章迁移到 {directory}")
+
+
+def dataset_exists(filename: str) -> bool:
+    return os.path.isdir(dataset_dir(filename)) or os.path.isfile(filename)
+
+
+def append_articles(filename: str, articles):
+    """按发布日期把文章追加到对应分段，每个分段一次写入并 fsync"""
+    if not articles:
+        return
+    with _write_lock:
+        migrate_legacy(filename)
+        directory = dataset_dir(filename)
+        os.makedirs(directory, exist_ok=True)
+        for day, day_articles in _group_by_day(articles).items():
+            path = os.path.join(directory, day + SEGMENT_SUFFIX)
+            text = _encode(day_articles)
+            with open(path, "a+b") as f:
+                # 上次写入如果中途崩溃留下了没有换行的残行，先补一个换行，避免新数据接在残行后面
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        text = "\n" + text
+                f.write(text.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def load_articles(filename: str):
+    """读取数据文件的全部文章（按分段日期顺序）"""
+    migrate_legacy(filename)
+    articles = []
+    for _, path in list_segments(filename):
+        articles.extend(read_segment(path))
+    return articles
+
+
+def read_json(filename: str) -> dict:
+    """以旧的 {status, totalResults, articles} 结构返回数据文件内容"""
+    if not dataset_exists(filename):
+        raise FileNotFoundError(f"File not found: {filename}")
+    articles = load_articles(filename)
+    return {"status": "ok", "totalResults": len(articles), "articles": articles}
+
+
+def list_datasets(folder: str):
+    """列出目录下的数据文件名（不含扩展名），分段目录和旧的 .json 文件都算"""
+    names = set()
+    if not os.path.isdir(folder):
+        return []
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.endswith(".json") and os.path.isfile(path):
+            names.add(name[:-len(".json")])
+        elif os.path.isdir(path) and not name.endswith(".migrating"):
+            names.add(name)
+    return sorted(names)
+
+
+def compact(filename: str):
+    """压缩：去掉重复文章、按发布时间排序重写每个分段，并重新生成整文件 JSON 快照"""
+    with _write_lock:
+        migrate_legacy(filename)
+        seen = set()
+        all_articles = []
+        for _, path in list_segments(filename):
+            articles = []
+            for article in read_segment(path):
+                key = article_id(article)
+                if key in seen:
+                    continue
+                seen.add(key)
+                articles.append(article)
+            articles.sort(key=lambda a: a.get("publishedAt") or "")
+            _write_atomic(path, _encode(articles))
+            all_articles.extend(articles)
+
+        snapshot = {"status": "ok", "totalResults": len(all_articles), "articles": all_articles}
+        text = json.dumps(snapshot, ensure_ascii=False, indent=4)
+        _write_atomic(filename, text)
+        # /data 静态目录直接发送预压缩版本
+        write_precompressed(filename, text.encode("utf-8"))
+    print(f"压缩完成: {filename}，共 {len(all_articles)} 篇文章")
+    return len(all_articles)
+
+
+def migrate_legacy_folder(folder: str):
+    """启动时调用：把目录下还没有分段的旧 JSON 全部迁移；读接口不再触发迁移。
+    单个文件损坏时大声报错并跳过，其他数据文件照常迁移"""
+    for name in list_datasets(folder):
+        try:
+            migrate_legacy(os.path.join(folder, name + ".json"))
+        except Exception as e:
+            print(f"[错误] 迁移旧数据文件失败，该类别的查询会返回错误: {e}")
+
+
+def compact_folder(folder: str):
+    for name in list_datasets(folder):
+        compact(os.path.join(folder, name + ".json"))
@@ -0,0 +1,111 @@
+#地图导出用的无头浏览器池：浏览器常驻复用，取用时做健康检查，渲染 N 次后回收重建，并发数不超过池大小。
+import os
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+
+EXPORT_BROWSER_POOL_SIZE = int(os.getenv("EXPORT_BROWSER_POOL_SIZE", 2))
+# 每个浏览器渲染多少次后回收，避免 Chrome 长时间运行内存持续上涨
+EXPORT_BROWSER_MAX_RENDERS = int(os.getenv("EXPORT_BROWSER_MAX_RENDERS", 50))
+# 池满时最多等待多少秒
+EXPORT_BROWSER_ACQUIRE_TIMEOUT = float(os.getenv("EXPORT_BROWSER_ACQUIRE_TIMEOUT", 60))
+
+
+def create_chrome_driver():
+    """使用undetected_chromedriver自动匹配Chrome版本"""
+    import undetected_chromedriver as uc
+
+    options = uc.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    return uc.Chrome(options=options)
+
+
+class BrowserSession:
+    def __init__(self, driver):
+        self.driver = driver
+        self.renders = 0
+
+
+class BrowserPool:
+    """有界浏览器池；浏览器在第一次被用到时才启动"""
+
+    def __init__(self, size: int = EXPORT_BROWSER_POOL_SIZE, max_renders: int = EXPORT_BROWSER_MAX_RENDERS,
+                 factory=create_chrome_driver):
+        self.size = size
+        self.max_renders = max_renders
+        self.factory = factory
+        self.created = 0
+        self.recycled = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _healthy(self, session: BrowserSession) -> bool:
+        try:
+            return session.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _discard(self, session: BrowserSession):
+        self.recycled += 1
+        try:
+            session.driver.quit()
+        except Exception as e:
+            print(f"关闭浏览器失败: {e}")
+
+    def _checkout(self) -> BrowserSession:
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                self.created += 1
+                return BrowserSession(self.factory())
+            if self._healthy(session):
+                return session
+            print("浏览器会话已失效，重新创建")
+            self._discard(session)
+
+    @contextmanager
+    def session(self, timeout: float = EXPORT_BROWSER_ACQUIRE_TIMEOUT):
+        """借出一个浏览器；渲染出错的浏览器直接丢弃，不放回池里"""
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("没有空闲的浏览器，请稍后重试")
+        session = None
+        try:
+            session = self._checkout()
+            yield session.driver
+        except BaseException:
+            if session is not None:
+                self._discard(session)
+            raise
+        else:
+            session.renders += 1
+            if self._closed or session.renders >= self.max_renders:
+                self._discard(session)
+            else:
+                self._idle.put(session)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "created": self.created,
+            "recycled": self.recycled,
+        }
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+browser_pool = BrowserPool()
+atexit.register(browser_pool.close)
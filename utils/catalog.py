@@ -0,0 +1,137 @@
+#进程内共享的文章目录：各分段只解析一次并保留时间戳索引，文件的 mtime/大小变化或收到写入通知时才重新读取。
+import os
+import hashlib
+import threading
+import orjson
+from bisect import bisect_left, bisect_right
+from utils import article_store
+
+
+class Segment:
+    """一个分段的解析结果：文件原顺序的文章列表 + 按发布时间排序的索引 + 每篇文章预先编码好的 JSON 字节"""
+
+    __slots__ = ("stamp", "articles", "timestamps", "sorted_articles", "blobs")
+
+    def __init__(self, stamp, articles):
+        self.stamp = stamp
+        self.articles = articles
+        self.timestamps, self.sorted_articles = article_store.index_segment(articles)
+        # 以文章字典的 id() 为键：分段还在目录里时这些字典一直存活，id 不会被复用
+        self.blobs = {id(article): orjson.dumps(article) for article in articles}
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class ArticleCatalog:
+    """读接口统一从这里取数据；返回的文章字典是共享的，调用方不要原地修改"""
+
+    def __init__(self):
+        self._segments = {}
+        self._listings = {}
+        # 目录里所有分段的 {id(文章): JSON 字节}
+        self._blobs = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _list_segments(self, filename):
+        """分段列表按目录 mtime 缓存，目录里新增分段时 mtime 会变。
+        读取路径不做迁移（迁移在启动和入库时进行）；只有旧 JSON 没有分段时报错，不把它当成空数据"""
+        directory = article_store.dataset_dir(filename)
+        try:
+            dir_stamp = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            if os.path.isfile(filename):
+                raise RuntimeError(f"{filename} 尚未迁移为分段（可能无法解析），请查看启动日志")
+            return []
+        cached = self._listings.get(directory)
+        if cached and cached[0] == dir_stamp:
+            return cached[1]
+        segments = article_store.list_segments(filename)
+        with self._lock:
+            self._listings[directory] = (dir_stamp, segments)
+        return segments
+
+    def segment(self, path):
+        try:
+            stamp = _stamp(path)
+        except FileNotFoundError:
+            return None
+        cached = self._segments.get(path)
+        if cached is not None and cached.stamp == stamp:
+            return cached
+        segment = Segment(stamp, article_store.read_segment(path))
+        with self._lock:
+            old = self._segments.get(path)
+            if old is not None:
+                self._forget(old)
+            self._segments[path] = segment
+            self._blobs.update(segment.blobs)
+            self.loads += 1
+        return segment
+
+    def _forget(self, segment):
+        for key in segment.blobs:
+            self._blobs.pop(key, None)
+
+    def blobs(self, articles):
+        """文章对应的 JSON 字节；不是目录里的文章（或所在分段已被替换）时现场编码"""
+        get = self._blobs.get
+        return [get(id(article)) or orjson.dumps(article) for article in articles]
+
+    def load_articles(self, filename):
+        articles = []
+        for _, path in self._list_segments(filename):
+            segment = self.segment(path)
+            if segment is not None:
+                articles.extend(segment.articles)
+        return articles
+
+    def query_time_range(self, filename, start_ts, end_ts):
+        result = []
+        for day, path in self._list_segments(filename):
+            day_range = article_store.segment_time_range(day)
+            if day_range is None or day_range[1] <= start_ts or day_range[0] > end_ts:
+                continue
+            segment = self.segment(path)
+            if segment is None:
+                continue
+            lo = bisect_left(segment.timestamps, start_ts)
+            hi = bisect_right(segment.timestamps, end_ts)
+            result.extend(segment.sorted_articles[lo:hi])
+        return result
+
+    def read_json(self, filename):
+        if not article_store.dataset_exists(filename):
+            raise FileNotFoundError(f"File not found: {filename}")
+        articles = self.load_articles(filename)
+        return {"status": "ok", "totalResults": len(articles), "articles": articles}
+
+    def version(self, filename):
+        """数据文件的当前版本（各分段的 mtime 和大小），任何追加或压缩都会改变它"""
+        parts = []
+        for _, path in self._list_segments(filename):
+            try:
+                mtime_ns, size = _stamp(path)
+            except FileNotFoundError:
+                continue
+            parts.append(f"{os.path.basename(path)}:{mtime_ns}:{size}")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+    def invalidate(self, filename=None):
+        """写入通知：丢弃某个数据文件（不传则全部）的缓存，下次读取时重新加载"""
+        with self._lock:
+            if filename is None:
+                self._segments.clear()
+                self._listings.clear()
+                self._blobs.clear()
+                return
+            directory = article_store.dataset_dir(filename)
+            self._listings.pop(directory, None)
+            for path in [p for p in self._segments if os.path.dirname(p) == directory]:
+                self._forget(self._segments.pop(path))
+
+
+catalog = ArticleCatalog()
@@ -0,0 +1,122 @@
+#图表预聚合：入库时按 国家 × 类别 × 日期 累加新闻地点数，图表接口只需对这些桶求和。
+import os
+import sqlite3
+import threading
+from utils.article_store import segment_day, list_datasets, UNDATED_SEGMENT
+from utils.catalog import catalog
+
+CHART_AGGREGATES_PATH = os.getenv("CHART_AGGREGATES_PATH", "data/chart_aggregates.sqlite3")
+CATEGORY_FOLDER = "data/top-headlines/category"
+
+
+def count_locations(articles):
+    """统计一批文章的 {(day, country): 地点数}，没有缓存国家的地点一次性做空间连接"""
+    counts = {}
+    pending = []
+    for article in articles:
+        day = segment_day(article)
+        for loc in article.get("location") or []:
+            if loc.get("country"):
+                key = (day, loc["country"])
+                counts[key] = counts.get(key, 0) + 1
+            else:
+                pending.append((day, (loc["lat"], loc["lng"])))
+
+    if pending:
+        # geopandas 只在确实需要空间判断时才导入
+        from utils.countries import lookup_countries
+        for (day, _), country in zip(pending, lookup_countries([point for _, point in pending])):
+            if country is not None:
+                counts[(day, country)] = counts.get((day, country), 0) + 1
+    return counts
+
+
+class ChartAggregates:
+    """counts 表按插入顺序（rowid）保留国家首次出现的先后，结果字典的顺序与原来逐篇累加时一致"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counts ("
+            "category TEXT NOT NULL, day TEXT NOT NULL, country TEXT NOT NULL, n INTEGER NOT NULL, "
+            "PRIMARY KEY (category, day, country))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    def _is_built(self):
+        return self._conn.execute("SELECT 1 FROM meta WHERE key = 'built'").fetchone() is not None
+
+    def _set_built(self, built: bool):
+        if built:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+        else:
+            self._conn.execute("DELETE FROM meta WHERE key = 'built'")
+
+    def _add(self, category, counts):
+        self._conn.executemany(
+            "INSERT INTO counts (category, day, country, n) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (category, day, country) DO UPDATE SET n = n + excluded.n",
+            [(category, day, country, n) for (day, country), n in counts.items()],
+        )
+
+    def record(self, category: str, articles):
+        """入库后调用：把新文章的地点计数累加到对应的桶"""
+        with self._lock:
+            if not self._is_built():
+                # 还没有完整构建过，第一次查询时会从存储重建，这里不用累加
+                return
+            try:
+                counts = count_locations(articles)
+            except Exception as e:
+                # 国家边界不可用时无法归类，标记为需要重建，等边界数据就绪后由查询触发
+                print(f"图表预聚合更新失败，将在下次查询时重建: {e}")
+                self._set_built(False)
+                self._conn.commit()
+                return
+            self._add(category, counts)
+            self._conn.commit()
+
+    def rebuild(self, folder: str = CATEGORY_FOLDER):
+        """从存储中的全部文章重新计算（首次使用或压缩去重之后）"""
+        with self._lock:
+            # 先算完全部计数再在一个事务里替换：计数失败（如国家边界文件缺失）时表保持原样，也不会留下未结束的写事务
+            counts = {
+                category: count_locations(catalog.load_articles(os.path.join(folder, category + ".json")))
+                for category in list_datasets(folder)
+            }
+            with self._conn:
+                self._conn.execute("DELETE FROM counts")
+                for category, category_counts in counts.items():
+                    self._add(category, category_counts)
+                self._set_built(True)
+        print("图表预聚合已重建")
+
+    def query(self, category: str = None, start_day: str = None, end_day: str = None):
+        """对桶求和，返回 {国家: 地点数}；start_day/end_day 为 YYYY-MM-DD（含两端）"""
+        if not self._is_built():
+            self.rebuild()
+        sql = "SELECT country, SUM(n) FROM counts WHERE 1 = 1"
+        params = []
+        if category:
+            sql += " AND category = ?"
+            params.append(category)
+        if start_day or end_day:
+            sql += " AND day != ?"
+            params.append(UNDATED_SEGMENT)
+        if start_day:
+            sql += " AND day >= ?"
+            params.append(start_day)
+        if end_day:
+            sql += " AND day <= ?"
+            params.append(end_day)
+        sql += " GROUP BY country ORDER BY MIN(rowid)"
+        with self._lock:
+            return dict(self._conn.execute(sql, params).fetchall())
+
+
+chart_aggregates = ChartAggregates(CHART_AGGREGATES_PATH)
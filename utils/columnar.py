@@ -0,0 +1,199 @@
+#列式快照：把一个数据文件的文章按发布时间排好，预先编码的 JSON 字节与时间戳、是否有地点等列一起写进单个文件，
+#各 worker 进程用 mmap 只读映射（页缓存里只有一份），读接口直接按时间二分、切片拼接响应，不必每个进程都解析 NDJSON。
+#快照记录生成时的数据版本，与 catalog.version 不一致（有新写入）时不使用，调用方退回 catalog。
+import os
+import json
+import mmap
+import threading
+import numpy as np
+import orjson
+from utils.article_store import dataset_dir, dataset_exists, parse_published_at
+from utils.catalog import catalog
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshots")
+MAGIC = b"NEWSCOL1"
+# 每篇文章的 JSON 后面跟一个逗号、每个发布时间后面跟一个换行，连续的若干行可以整段切出
+BLOB_SEP = b","
+PUBLISHED_SEP = b"\n"
+
+
+def snapshot_path(filename: str) -> str:
+    name = dataset_dir(filename).replace("\\", "/").strip("/").replace("/", "__")
+    return os.path.join(SNAPSHOT_DIR, name + ".col")
+
+
+def _pad(size: int) -> int:
+    return -size % 8
+
+
+def write_snapshot(filename: str, articles, version: str):
+    """articles 为数据文件原顺序的文章；有发布时间的按时间排在前面，没有的排在最后"""
+    stamps = [parse_published_at(article) for article in articles]
+    dated = sorted((i for i, stamp in enumerate(stamps) if stamp is not None), key=lambda i: stamps[i])
+    undated = [i for i, stamp in enumerate(stamps) if stamp is None]
+    order = dated + undated
+
+    blobs = [orjson.dumps(articles[i]) + BLOB_SEP for i in order]
+    published = [(articles[i].get("publishedAt") or "").encode("utf-8") + PUBLISHED_SEP for i in order]
+    # 原文件中第 p 篇文章所在的行号
+    file_order = np.empty(len(order), dtype=np.int64)
+    file_order[np.asarray(order, dtype=np.int64)] = np.arange(len(order), dtype=np.int64)
+    columns = {
+        "timestamps": np.asarray([stamps[i].timestamp() for i in dated], dtype=np.float64),
+        "has_location": np.asarray([bool(articles[i].get("location")) for i in order], dtype=np.uint8),
+        "blob_offsets": np.cumsum([0] + [len(b) for b in blobs], dtype=np.int64),
+        "published_offsets": np.cumsum([0] + [len(p) for p in published], dtype=np.int64),
+        "file_order": file_order,
+    }
+    sections = [(name, array.tobytes(), array.dtype.str, len(array)) for name, array in columns.items()]
+    sections.append(("blobs", b"".join(blobs), "|u1", None))
+    sections.append(("published", b"".join(published), "|u1", None))
+
+    # 头部长度会影响各段偏移，偏移又写在头部里：反复计算直到不再变化
+    header = {"version": version, "count": len(order), "dated": len(dated), "sections": {}}
+    while True:
+        head = json.dumps(header).encode("utf-8")
+        offset = len(MAGIC) + 8 + len(head)
+        offset += _pad(offset)
+        layout = {}
+        for name, data, dtype, length in sections:
+            layout[name] = [offset, len(data), dtype, length]
+            offset += len(data) + _pad(len(data))
+        if layout == header["sections"]:
+            break
+        header["sections"] = layout
+    path = snapshot_path(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + len(head).to_bytes(8, "little") + head)
+        for name, data, _, _ in sections:
+            f.seek(layout[name][0])
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    # 原子替换：已经映射旧文件的进程继续读旧内容，下次检查时换成新文件
+    os.replace(tmp_path, path)
+    return len(order)
+
+
+class Selection:
+    """快照里的一组行：连续区间 [lo, hi) 或行号数组"""
+
+    __slots__ = ("snapshot", "lo", "hi", "rows")
+
+    def __init__(self, snapshot, lo=0, hi=0, rows=None):
+        self.snapshot = snapshot
+        self.lo, self.hi, self.rows = lo, hi, rows
+
+    @property
+    def count(self) -> int:
+        return len(self.rows) if self.rows is not None else self.hi - self.lo
+
+    def _join(self, data, offsets):
+        """去掉最后一个分隔符的拼接结果"""
+        if not self.count:
+            return b""
+        if self.rows is None:
+            return data[offsets[self.lo]:offsets[self.hi] - 1].tobytes()
+        starts = offsets[self.rows].tolist()
+        ends = offsets[self.rows + 1].tolist()
+        return b"".join([data[s:e] for s, e in zip(starts, ends)])[:-1]
+
+    def body(self) -> bytes:
+        """逗号分隔的文章 JSON"""
+        return self._join(self.snapshot.blobs, self.snapshot.blob_offsets)
+
+    def published(self) -> bytes:
+        """换行分隔的发布时间，用于计算 ETag"""
+        return self._join(self.snapshot.published, self.snapshot.published_offsets)
+
+
+class ColumnarSnapshot:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.stamp = (st.st_mtime_ns, st.st_size)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"不是列式快照文件: {path}")
+        head_len = int.from_bytes(self._mm[len(MAGIC):len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        header = json.loads(self._mm[start:start + head_len])
+        self.version = header["version"]
+        self.count = header["count"]
+        self.dated = header["dated"]
+        view = memoryview(self._mm)
+        for name, (offset, size, dtype, length) in header["sections"].items():
+            if length is None:
+                setattr(self, name, view[offset:offset + size])
+            else:
+                setattr(self, name, np.frombuffer(self._mm, dtype=np.dtype(dtype), count=length, offset=offset))
+
+    def _rows(self, lo, hi, with_location):
+        if not with_location:
+            return Selection(self, lo, hi)
+        mask = self.has_location[lo:hi]
+        if mask.all():
+            return Selection(self, lo, hi)
+        return Selection(self, rows=lo + np.flatnonzero(mask))
+
+    def time_range(self, start_ts: float, end_ts: float, with_location: bool = False) -> Selection:
+        """发布时间在 [start_ts, end_ts] 内的文章，按时间升序（与 catalog.query_time_range 顺序相同）"""
+        lo = int(np.searchsorted(self.timestamps, start_ts, side="left"))
+        hi = int(np.searchsorted(self.timestamps, end_ts, side="right"))
+        return self._rows(lo, max(lo, hi), with_location)
+
+    def all(self) -> Selection:
+        """全部文章，数据文件原顺序（与 catalog.load_articles 顺序相同）"""
+        if np.array_equal(self.file_order, np.arange(self.count)):
+            return Selection(self, 0, self.count)
+        return Selection(self, rows=self.file_order)
+
+
+class SnapshotStore:
+    def __init__(self):
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename: str):
+        """与数据当前版本一致的快照；没有快照或快照已过期时返回 None"""
+        path = snapshot_path(filename)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        snapshot = self._open.get(path)
+        if snapshot is None or snapshot.stamp != (st.st_mtime_ns, st.st_size):
+            try:
+                snapshot = ColumnarSnapshot(path)
+            except (OSError, ValueError) as e:
+                print(f"打开列式快照失败: {path} {e}")
+                return None
+            with self._lock:
+                self._open[path] = snapshot
+        if snapshot.version != catalog.version(filename):
+            return None
+        return snapshot
+
+    def build(self, filenames):
+        """为数据已变化的文件重新生成快照（由写数据的进程调用）"""
+        for filename in filenames:
+            # 某个数据文件读不出来（如旧 JSON 损坏、尚未迁移）时跳过它，其他文件照常生成
+            try:
+                self._build_one(filename)
+            except Exception as e:
+                print(f"生成列式快照失败: {filename} {e}")
+
+    def _build_one(self, filename: str):
+        if not dataset_exists(filename) or self.get(filename) is not None:
+            return
+        # 先取版本再读数据：读的过程中有新写入时，快照版本对不上，不会被使用
+        version = catalog.version(filename)
+        # 没有文章的数据文件也写一个空快照，否则查询全部类别时会因为它缺快照而整体退回 catalog
+        articles = catalog.load_articles(filename)
+        count = write_snapshot(filename, articles, version)
+        print(f"列式快照已生成: {snapshot_path(filename)}，共 {count} 篇文章")
+
+
+snapshots = SnapshotStore()
@@ -0,0 +1,153 @@
+#响应压缩：客户端接受 br 且安装了 brotli 时用 brotli，否则 gzip；图片等本身已压缩的内容不再压缩。
+#压缩后的表示在强 ETag 末尾加上编码后缀（"xxx" -> "xxx-gzip"），与未压缩的表示区分开，比较时再去掉后缀。
+import os
+from mimetypes import guess_type
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import IdentityResponder, GZipResponder
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+# 动态响应用较低的压缩级别，换取更短的首字节时间；预压缩的静态文件用最高级别
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "image/", "application/gzip", "application/zip")
+ENCODING_SUFFIXES = {"gzip": "-gzip", "br": "-br"}
+# 预压缩文件的 (编码, 扩展名)，按优先顺序
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def strip_encoding_suffix(tag: str) -> str:
+    """去掉 W/ 前缀和编码后缀，得到可比较的 ETag"""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIXES.values():
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_in(etag: str, if_none_match: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    etag = strip_encoding_suffix(etag)
+    return any(strip_encoding_suffix(tag) == etag for tag in if_none_match.split(","))
+
+
+class _ExcludeTypesMixin:
+    async def send_with_compression(self, message):
+        await super().send_with_compression(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            self.content_type_is_excluded = content_type.startswith(EXCLUDED_CONTENT_TYPES)
+
+
+class _Identity(_ExcludeTypesMixin, IdentityResponder):
+    pass
+
+
+class _GZip(_ExcludeTypesMixin, GZipResponder):
+    pass
+
+
+class _Brotli(_ExcludeTypesMixin, IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        # 流式响应每块都 flush，客户端可以边收边解压
+        out = self.compressor.process(body)
+        return out + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+def _tag_encoded_etag(send):
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            encoding = headers.get("content-encoding")
+            etag = headers.get("etag")
+            if encoding in ENCODING_SUFFIXES and etag and not etag.startswith("W/") \
+                    and not etag.endswith(ENCODING_SUFFIXES[encoding] + '"'):
+                headers["etag"] = etag[:-1] + ENCODING_SUFFIXES[encoding] + '"'
+        await send(message)
+    return wrapped
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        if brotli is not None and "br" in accept:
+            responder = _Brotli(self.app, self.minimum_size)
+        elif "gzip" in accept:
+            responder = _GZip(self.app, self.minimum_size, compresslevel=GZIP_LEVEL)
+        else:
+            responder = _Identity(self.app, self.minimum_size)
+        await responder(scope, receive, _tag_encoded_etag(send))
+
+
+def write_precompressed(path: str, content: bytes):
+    """为静态文件生成 .gz（以及安装了 brotli 时的 .br）版本，需在原文件写完之后调用"""
+    import gzip
+
+    variants = [(".gz", lambda: gzip.compress(content, compresslevel=STATIC_GZIP_LEVEL, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", lambda: brotli.compress(content, quality=STATIC_BROTLI_QUALITY)))
+    for suffix, compress in variants:
+        tmp_path = f"{path}{suffix}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compress())
+        os.replace(tmp_path, path + suffix)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """静态文件旁边有不旧于原文件的 .br/.gz 时直接发送压缩版本"""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        accept = request_headers.get("accept-encoding", "")
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding not in accept:
+                continue
+            variant = f"{full_path}{suffix}"
+            try:
+                variant_stat = os.stat(variant)
+            except FileNotFoundError:
+                continue
+            if variant_stat.st_mtime < stat_result.st_mtime:
+                # 原文件更新后压缩版本还没重新生成
+                continue
+            response = FileResponse(
+                variant, status_code=status_code, stat_result=variant_stat,
+                media_type=guess_type(str(full_path))[0] or "text/plain",
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+        return super().file_response(full_path, stat_result, scope, status_code)
+
+    def is_not_modified(self, response_headers, request_headers) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        etag = response_headers.get("etag")
+        if if_none_match and etag:
+            return etag_in(etag, if_none_match)
+        return super().is_not_modified(response_headers, request_headers)
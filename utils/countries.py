@@ -0,0 +1,88 @@
+#国家边界：shp 只加载一次，点位所属国家用空间连接（STRtree 索引）批量判断，并按经纬度缓存结果。
+import os
+import threading
+import geopandas as gpd
+
+COUNTRIES_DATA_DIR = os.getenv("COUNTRIES_DATA_DIR", "charts_data")
+UNKNOWN_COUNTRY = "未知国家"
+
+_lock = threading.Lock()
+_countries_gdf = None
+_point_cache = {}
+
+
+def load_country_shapes(data_dir: str = COUNTRIES_DATA_DIR) -> gpd.GeoDataFrame:
+    """加载国家行政区划shp数据（进程内只读一次）"""
+    global _countries_gdf
+    if _countries_gdf is not None:
+        return _countries_gdf
+    with _lock:
+        if _countries_gdf is not None:
+            return _countries_gdf
+        try:
+            countries_file = os.path.join(data_dir, "countries.shp")
+            if not os.path.exists(countries_file):
+                raise FileNotFoundError(f"国家shp文件不存在: {countries_file}")
+
+            gdf = gpd.read_file(countries_file)
+
+            # 转为 WGS84 坐标系
+            if gdf.crs is None:
+                gdf = gdf.set_crs(epsg=4326)
+            else:
+                gdf = gdf.to_crs(epsg=4326)
+
+            # 提前建好空间索引，之后的空间连接直接复用
+            gdf.sindex
+            _countries_gdf = gdf
+            return gdf
+        except Exception as e:
+            print(f"加载国家shp数据时出错: {e}")
+            raise
+
+
+def _name_column(countries_gdf: gpd.GeoDataFrame):
+    for column in ("NAME", "COUNTRY"):
+        if column in countries_gdf.columns:
+            return column
+    return None
+
+
+def lookup_countries(points, countries_gdf: gpd.GeoDataFrame = None):
+    """批量判断 [(lat, lng), ...] 所在的国家名，不在任何国家内的点返回 None"""
+    results = [None] * len(points)
+    pending = {}
+    for i, point in enumerate(points):
+        key = (point[0], point[1])
+        if key in _point_cache:
+            results[i] = _point_cache[key]
+        else:
+            pending.setdefault(key, []).append(i)
+    if not pending:
+        return results
+
+    if countries_gdf is None:
+        countries_gdf = load_country_shapes()
+    keys = list(pending)
+    points_gdf = gpd.GeoDataFrame(
+        geometry=gpd.points_from_xy([lng for _, lng in keys], [lat for lat, _ in keys]),
+        crs=countries_gdf.crs,
+    )
+    name_column = _name_column(countries_gdf)
+    right = countries_gdf[[name_column, "geometry"]] if name_column else countries_gdf[["geometry"]]
+    joined = gpd.sjoin(points_gdf, right, how="inner", predicate="within")
+    # 一个点落在多个多边形里时，和原来逐个 contains 的写法一样取排在最前面的国家
+    joined = joined.sort_values("index_right", kind="stable")
+    joined = joined[~joined.index.duplicated(keep="first")]
+
+    if name_column:
+        names = joined[name_column].where(joined[name_column].notna(), None).to_dict()
+    else:
+        names = dict.fromkeys(joined.index, UNKNOWN_COUNTRY)
+
+    for point_index, key in enumerate(keys):
+        name = names.get(point_index)
+        _point_cache[key] = name
+        for i in pending[key]:
+            results[i] = name
+    return results
@@ -0,0 +1,54 @@
+#数据版本文件：入库进程每完成一次更新就改写它，API 进程定期查看 mtime，变化时丢弃由文章派生的内存索引。
+#文章本身由 catalog 按分段 mtime 自动重新读取，这里只负责聚类、矢量瓦片这类入库时增量维护的状态。
+import asyncio
+import json
+import os
+import time
+
+DATA_VERSION_PATH = os.getenv("DATA_VERSION_PATH", "data/.data_version")
+DATA_VERSION_POLL_SECONDS = float(os.getenv("DATA_VERSION_POLL_SECONDS", 2))
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def bump(reason: str, path: str = DATA_VERSION_PATH):
+    """数据写入完成后调用"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    content = {"version": time.time_ns(), "pid": os.getpid(), "reason": reason}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+    os.replace(tmp_path, path)
+
+
+def read(path: str = DATA_VERSION_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+async def watch(on_change, path: str = DATA_VERSION_PATH, interval: float = DATA_VERSION_POLL_SECONDS):
+    """轮询版本文件，其他进程写入了新版本时调用 on_change(版本信息)；本进程自己写的版本忽略"""
+    last = _stamp(path)
+    while True:
+        await asyncio.sleep(interval)
+        stamp = _stamp(path)
+        if stamp == last:
+            continue
+        last = stamp
+        info = read(path)
+        if info is None or info.get("pid") == os.getpid():
+            continue
+        try:
+            on_change(info)
+        except Exception as e:
+            print(f"处理数据版本变化失败: {e}")
@@ -0,0 +1,83 @@
+#地图导出结果存储：按请求内容的哈希把 PNG 存到磁盘，超过有效期的结果在读取或写入时清理。
+import os
+import time
+import hashlib
+import threading
+
+EXPORT_RESULT_DIR = os.getenv("EXPORT_RESULT_DIR", "data/exports")
+EXPORT_RESULT_TTL_HOURS = float(os.getenv("EXPORT_RESULT_TTL_HOURS", 24))
+# 两次全目录过期清理之间至少间隔多少秒
+PURGE_INTERVAL = 600
+
+
+def request_key(payload: str) -> str:
+    """导出请求的规范化 JSON -> 结果 id；内容相同的请求得到同一个 id"""
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_valid_key(key: str) -> bool:
+    return len(key) == 64 and all(c in "0123456789abcdef" for c in key)
+
+
+class ExportStore:
+    def __init__(self, root: str = EXPORT_RESULT_DIR, ttl_seconds: float = EXPORT_RESULT_TTL_HOURS * 3600):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.png")
+
+    def _expired(self, mtime: float, now: float) -> bool:
+        return now - mtime > self.ttl_seconds
+
+    def get(self, key: str):
+        """返回未过期结果的文件路径，没有或已过期返回 None"""
+        path = self.path(key)
+        try:
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+        if self._expired(mtime, time.time()):
+            self._remove(path)
+            return None
+        return path
+
+    def save(self, key: str, content: bytes) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        self.purge()
+        return path
+
+    def purge(self, force: bool = False):
+        """删除过期的结果文件"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            if not name.endswith(".png"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if self._expired(os.path.getmtime(path), now):
+                    self._remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+export_store = ExportStore()
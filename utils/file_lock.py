@@ -0,0 +1,76 @@
+#跨进程文件锁：Linux/macOS 用 fcntl.flock，Windows 用 msvcrt.locking；持有锁的进程退出后锁自动释放。
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Windows 下阻塞等待时的重试间隔（秒）
+_POLL_SECONDS = 0.5
+
+
+class FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def _try_lock(self, f) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """blocking=False 时拿不到锁立即返回 False"""
+        if self._file is not None:
+            raise RuntimeError(f"锁已被本对象持有: {self.path}")
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, "a+")
+        if blocking and fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            while not self._try_lock(f):
+                if not blocking:
+                    f.close()
+                    return False
+                time.sleep(_POLL_SECONDS)
+        # 记下持有者的 pid，便于排查是谁占着锁
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        f, self._file = self._file, None
+        if f is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
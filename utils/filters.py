@@ -1,6 +1,8 @@
 import os
 import json
 from datetime import datetime, timezone, timedelta
+from utils.article_store import dataset_exists
+from utils.catalog import catalog
 
 COUNTRIES_LANGUAGES = {
     "in": "en", "us": "en", "au": "en", "ru": "ru", 
@@ -12,126 +14,99 @@ CATEGORIES = [
 ]
 SOURCES = ["bbc.co.uk", "cnn.com", "foxnews.com", "google.com"]
 
+def category_file(category: str) -> str:
+    return os.path.join("data", "top-headlines", "category", f"{category}.json")
+
+def category_files(category: str = None):
+    """筛选涉及的数据文件：指定类别时只有它自己，否则为所有类别"""
+    return [category_file(category)] if category else [category_file(c) for c in CATEGORIES]
+
+def parse_utc(time_str: str) -> datetime:
+    """ISO 时间字符串转成 UTC 的 datetime：带时区的换算到 UTC，不带的按 UTC 处理"""
+    dt = datetime.fromisoformat(time_str)
+    return dt.astimezone(timezone.utc) if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def parse_time_range(start_time_str: str, end_time_str: str):
+    """把 ISO 时间字符串解析为 UTC 时间戳区间"""
+    try:
+        start_time = parse_utc(start_time_str)
+        end_time = parse_utc(end_time_str)
+    except Exception as e:
+        raise ValueError(f"时间格式错误: {e}")
+    return start_time.timestamp(), end_time.timestamp()
+
+def filter_categories(categories, start_ts: float, end_ts: float):
+    """多个类别按时间区间过滤，不存在的类别跳过"""
+    filtered_news = []
+    for category in categories:
+        filepath = category_file(category)
+        if dataset_exists(filepath):
+            filtered_news.extend(catalog.query_time_range(filepath, start_ts, end_ts))
+    return {"totalResults": len(filtered_news), "articles": filtered_news}
+
+def selection_window(category: str = None, start_time_str: str = None, end_time_str: str = None):
+    """与 select_articles 的参数组合一致：返回 (涉及的数据文件, 起始时间戳, 结束时间戳)"""
+    if start_time_str and end_time_str:
+        start_ts, end_ts = parse_time_range(start_time_str, end_time_str)
+        return category_files(category), start_ts, end_ts
+    now = datetime.now(timezone.utc)
+    # 只给类别时取近 2 天，什么都不给时取所有类别近 3 天
+    days = 2 if category else 3
+    return category_files(category), (now - timedelta(days=days)).timestamp(), now.timestamp()
+
 def filter_by_category(category: str):
     """根据类别过滤近2天内的头条新闻"""
-    filepath = f"data/top-headlines/category/{category}.json"
-    if not os.path.isfile(filepath):
+    filepath = category_file(category)
+    if not dataset_exists(filepath):
         raise FileNotFoundError(f"File not found: {filepath}")
 
     now = datetime.now(timezone.utc)
     past_day = now - timedelta(days=2)
-
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    filtered_news = []
-    for news in data.get('articles', []):
-        pub_time_str = news.get('publishedAt')
-        if not pub_time_str:
-            continue
-        try:
-            pub_time = datetime.fromisoformat(pub_time_str.replace("Z", "+00:00"))
-        except Exception:
-            continue
-        if past_day <= pub_time <= now:
-            filtered_news.append(news)
-
+    filtered_news = catalog.query_time_range(filepath, past_day.timestamp(), now.timestamp())
     return {"totalResults": len(filtered_news), "articles": filtered_news}
 
 def filter_by_time(category: str, start_time_str: str, end_time_str: str):
     """根据类别和时间范围过滤新闻"""
-    filepath = os.path.join("data", "top-headlines", "category", f"{category}.json")
-    if not os.path.isfile(filepath):
+    filepath = category_file(category)
+    if not dataset_exists(filepath):
         raise FileNotFoundError(f"File not found: {filepath}")
 
-    try:
-        start_time = datetime.fromisoformat(start_time_str).replace(tzinfo=timezone.utc)
-        end_time = datetime.fromisoformat(end_time_str).replace(tzinfo=timezone.utc)
-    except Exception as e:
-        raise ValueError(f"时间格式错误: {e}")
-
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    filtered_news = []
-    for news in data.get("articles", []):
-        pub_time = news.get("publishedAt")
-        if not pub_time:
-            continue
-        try:
-            pub_time_obj = datetime.fromisoformat(pub_time.replace("Z", "+00:00"))
-        except Exception:
-            continue
-        if start_time <= pub_time_obj <= end_time:
-            filtered_news.append(news)
-
+    start_ts, end_ts = parse_time_range(start_time_str, end_time_str)
+    filtered_news = catalog.query_time_range(filepath, start_ts, end_ts)
     return {"totalResults": len(filtered_news), "articles": filtered_news}
 
 def filter_all_by_time(start_time_str: str, end_time_str: str):
     """所有类别，根据时间范围过滤新闻"""
-    try:
-        start_time = datetime.fromisoformat(start_time_str).replace(tzinfo=timezone.utc)
-        end_time = datetime.fromisoformat(end_time_str).replace(tzinfo=timezone.utc)
-    except Exception as e:
-        raise ValueError(f"时间格式错误: {e}")
-
-    filtered_news = []
-
-    for category in CATEGORIES:
-        filepath = os.path.join("data", "top-headlines", "category", f"{category}.json")
-        if not os.path.exists(filepath):
-            continue
-
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        for news in data.get("articles", []):
-            pub_time_str = news.get("publishedAt")
-            if not pub_time_str:
-                continue
-            try:
-                pub_time = datetime.fromisoformat(pub_time_str.replace("Z", "+00:00"))
-            except Exception:
-                continue
-            if start_time <= pub_time <= end_time:
-                filtered_news.append(news)
-
-    return {"totalResults": len(filtered_news), "articles": filtered_news}
+    start_ts, end_ts = parse_time_range(start_time_str, end_time_str)
+    return filter_categories(CATEGORIES, start_ts, end_ts)
 
 def filter_recent_days(days: int = 3):
     """默认返回近days天内的所有类别的新闻"""
     now = datetime.now(timezone.utc)
     past_time = now - timedelta(days=days)
-
-    filtered_news = []
-
-    for category in CATEGORIES:
-        filepath = os.path.join("data", "top-headlines", "category", f"{category}.json")
-        if not os.path.isfile(filepath):
-            continue
-
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        for news in data.get("articles", []):
-            pub_time_str = news.get("publishedAt")
-            if not pub_time_str:
-                continue
-            try:
-                pub_time = datetime.fromisoformat(pub_time_str.replace("Z", "+00:00"))
-            except Exception:
-                continue
-            if past_time <= pub_time <= now:
-                filtered_news.append(news)
-
-    return {"totalResults": len(filtered_news), "articles": filtered_news}
+    return filter_categories(CATEGORIES, past_time.timestamp(), now.timestamp())
 
 def get_everything_by_source(source: str):
     """获取特定来源的所有文章"""
     filepath = f"data/everything/{source}.json"
-    if not os.path.isfile(filepath):
-        raise FileNotFoundError(f"File not found: {filepath}")
+    return catalog.read_json(filepath)
 
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
\ No newline at end of file
+def parse_bbox(bbox_str: str):
+    """bbox 字符串 "minLng,minLat,maxLng,maxLat" -> 四元组；minLng > maxLng 表示跨越 180° 经线"""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox_str.split(","))
+    except Exception:
+        raise ValueError("bbox 格式应为 minLng,minLat,maxLng,maxLat")
+    if min_lat > max_lat:
+        raise ValueError("bbox 的 minLat 不能大于 maxLat")
+    return min_lng, min_lat, max_lng, max_lat
+
+def in_bbox(lng: float, lat: float, bbox) -> bool:
+    if bbox is None:
+        return True
+    min_lng, min_lat, max_lng, max_lat = bbox
+    if not (min_lat <= lat <= max_lat):
+        return False
+    if min_lng <= max_lng:
+        return min_lng <= lng <= max_lng
+    return lng >= min_lng or lng <= max_lng
@@ -0,0 +1,115 @@
+#离线地名表：把 GeoNames 格式的 TSV 载入内存索引，新闻里常见的国家、城市、地区不必再请求百度接口。
+#名字和别名按 normalize_key 建索引；重名时正式名称优先于别名，其次国家、首都，再按人口排序，载入时就选定每个名字的结果。
+import os
+import threading
+from array import array
+from utils.place_normalizer import normalize_key
+
+# 逗号分隔，可以加入 GeoNames 的 cities15000.txt 等导出文件；留空则不用离线地名表
+GAZETTEER_PATHS = [p.strip() for p in os.getenv("GAZETTEER_PATHS", "data/gazetteer.tsv").split(",") if p.strip()]
+
+# 没有表头的文件按 GeoNames 导出的列顺序读取
+GEONAMES_COLUMNS = {
+    "name": 1, "asciiname": 2, "alternatenames": 3, "latitude": 4, "longitude": 5,
+    "feature_code": 7, "country_code": 8, "population": 14,
+}
+COUNTRY_FEATURE_CODES = {"PCL", "PCLI", "PCLD", "PCLF", "PCLS", "PCLIX", "TERR"}
+CAPITAL_FEATURE_CODES = {"PPLC"}
+
+
+def _feature_rank(feature_code: str) -> int:
+    if feature_code in COUNTRY_FEATURE_CODES:
+        return 0
+    if feature_code in CAPITAL_FEATURE_CODES:
+        return 1
+    return 2
+
+
+def _read_rows(path):
+    """逐行产出 {列名: 值}；'#' 开头的行是注释"""
+    columns = GEONAMES_COLUMNS
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split("\t")
+            if fields[0] == "name":
+                columns = {name: i for i, name in enumerate(fields)}
+                continue
+            yield {name: fields[i] if i < len(fields) else "" for name, i in columns.items()}
+
+
+class Gazetteer:
+    def __init__(self, paths):
+        self.paths = paths
+        self.hits = 0
+        self.misses = 0
+        self._lat = array("d")
+        self._lng = array("d")
+        # 规范化键 -> 行号
+        self._index = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        best = {}
+        for path in self.paths:
+            try:
+                rows = list(_read_rows(path))
+            except OSError as e:
+                print(f"加载离线地名表失败: {path} {e}")
+                continue
+            for row in rows:
+                try:
+                    lat, lng = float(row["latitude"]), float(row["longitude"])
+                    population = int(row.get("population") or 0)
+                except (KeyError, ValueError):
+                    continue
+                idx = len(self._lat)
+                self._lat.append(lat)
+                self._lng.append(lng)
+                feature_rank = _feature_rank(row.get("feature_code", ""))
+                names = [(row["name"], 0), (row.get("asciiname", ""), 0)]
+                names.extend((alias, 1) for alias in (row.get("alternatenames") or "").split(","))
+                for name, is_alias in names:
+                    key = normalize_key(name)
+                    if not key:
+                        continue
+                    rank = (is_alias, feature_rank, -population, idx)
+                    if key not in best or rank < best[key][0]:
+                        best[key] = (rank, idx)
+        self._index = {key: idx for key, (_, idx) in best.items()}
+        print(f"离线地名表已加载 {len(self._lat)} 个地点、{len(self._index)} 个名字")
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def lookup(self, name: str):
+        """返回坐标字典，地名表里没有时返回 None"""
+        self._ensure_loaded()
+        idx = self._index.get(normalize_key(name))
+        if idx is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {"lat": self._lat[idx], "lng": self._lng[idx]}
+
+    def stats(self):
+        self._ensure_loaded()
+        lookups = self.hits + self.misses
+        return {
+            "places": len(self._lat),
+            "names": len(self._index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+gazetteer = Gazetteer(GAZETTEER_PATHS)
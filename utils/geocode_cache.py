@@ -0,0 +1,101 @@
+#地理编码结果缓存：SQLite 持久化，启动时整表载入内存，支持过期时间与失败结果（负缓存）。
+import os
+import sqlite3
+import threading
+import time
+
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "data/geocode_cache.sqlite3")
+GEOCODE_CACHE_TTL_DAYS = float(os.getenv("GEOCODE_CACHE_TTL_DAYS", 30))
+GEOCODE_NEGATIVE_TTL_HOURS = float(os.getenv("GEOCODE_NEGATIVE_TTL_HOURS", 24))
+
+# get() 未命中时的返回值，用来和负缓存的 None 区分
+MISSING = object()
+
+
+class GeocodeCache:
+    """地名 -> 经纬度 的磁盘缓存，None 表示该地名已知无法解析"""
+
+    def __init__(self, path: str, ttl: float, negative_ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            "name TEXT PRIMARY KEY, lat REAL, lng REAL, expires_at REAL NOT NULL)"
+        )
+        self._load()
+
+    def _load(self):
+        """启动时载入未过期的条目，顺便清理过期行"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM geocode WHERE expires_at <= ?", (now,))
+            self._conn.commit()
+            for name, lat, lng, expires_at in self._conn.execute(
+                "SELECT name, lat, lng, expires_at FROM geocode"
+            ):
+                coords = None if lat is None else {"lat": lat, "lng": lng}
+                self._entries[name] = (coords, expires_at)
+        print(f"地理编码缓存已加载 {len(self._entries)} 条: {self.path}")
+
+    def get(self, name: str):
+        """命中返回坐标字典或 None（负缓存），未命中返回 MISSING"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[1] > time.time():
+                coords = entry[0]
+                if coords is None:
+                    self.negative_hits += 1
+                    return None
+                self.hits += 1
+                return dict(coords)
+            if entry is not None:
+                del self._entries[name]
+            self.misses += 1
+            return MISSING
+
+    def set(self, name: str, coords):
+        """写入查询结果，coords 为 None 时按负缓存的过期时间保存"""
+        ttl = self.ttl if coords else self.negative_ttl
+        expires_at = time.time() + ttl
+        lat = coords["lat"] if coords else None
+        lng = coords["lng"] if coords else None
+        with self._lock:
+            self._entries[name] = ({"lat": lat, "lng": lng} if coords else None, expires_at)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode (name, lat, lng, expires_at) VALUES (?, ?, ?, ?)",
+                (name, lat, lng, expires_at),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        """返回命中/未命中计数"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.negative_hits = self.misses = 0
+
+
+geocode_cache = GeocodeCache(
+    GEOCODE_CACHE_PATH,
+    ttl=GEOCODE_CACHE_TTL_DAYS * 86400,
+    negative_ttl=GEOCODE_NEGATIVE_TTL_HOURS * 3600,
+)
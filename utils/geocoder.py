@@ -0,0 +1,122 @@
+#百度地理编码异步客户端：共享连接池，每个 key 一个令牌桶，按所有 key 的总配额并发请求。
+import os
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+BAIDU_GEOCODER_URL = os.getenv("BAIDU_GEOCODER_URL", "http://api.map.baidu.com/geocoding/v3/")
+# 每个 key 每秒允许的请求数（百度个人开发者默认配额较低，按需调整）
+GEOCODE_QPS_PER_KEY = float(os.getenv("GEOCODE_QPS_PER_KEY", 1))
+GEOCODE_MAX_RETRIES = int(os.getenv("GEOCODE_MAX_RETRIES", 3))
+GEOCODE_BACKOFF_SECONDS = float(os.getenv("GEOCODE_BACKOFF_SECONDS", 0.5))
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", 5))
+
+# 这些状态码表示地址本身查不到（而不是 key 或配额问题），结果可以进负缓存
+BAIDU_NOT_FOUND_STATUS = {1, 2}
+# 并发超限，换个时间（或换个 key）重试即可
+BAIDU_RETRY_STATUS = {401}
+
+
+class TokenBucket:
+    """令牌桶限流，rate 为每秒补充的令牌数"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """拿到令牌返回 0，否则返回还需等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class AsyncBaiduGeocoder:
+    """按 key 限流的并发地理编码客户端，令牌桶状态在多次批量调用之间保留"""
+
+    def __init__(self, keys, qps_per_key: float = GEOCODE_QPS_PER_KEY, url: str = BAIDU_GEOCODER_URL,
+                 max_retries: int = GEOCODE_MAX_RETRIES, backoff: float = GEOCODE_BACKOFF_SECONDS,
+                 timeout: float = GEOCODE_TIMEOUT):
+        if not keys:
+            raise ValueError("至少需要一个地理编码 key")
+        self.url = url
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.buckets = {key: TokenBucket(qps_per_key) for key in keys}
+        # 总配额决定并发上限，再乘 2 让请求的网络往返时间能被重叠掉
+        self.max_concurrency = max(1, int(qps_per_key * len(keys) * 2))
+
+    async def acquire_key(self) -> str:
+        """等待任意一个 key 有可用令牌，返回该 key"""
+        while True:
+            waits = []
+            for key, bucket in self.buckets.items():
+                wait = bucket.try_acquire()
+                if wait == 0:
+                    return key
+                waits.append(wait)
+            await asyncio.sleep(min(waits))
+
+    async def geocode(self, client: httpx.AsyncClient, location_name: str):
+        """查询单个地名，返回 (坐标或 None, 结果是否可以缓存)"""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random()))
+            key = await self.acquire_key()
+            params = {"address": location_name, "output": "json", "ak": key}
+            try:
+                resp = await client.get(self.url, params=params)
+                if resp.status_code >= 500:
+                    print(f"地理编码服务返回 {resp.status_code}，重试: {location_name}")
+                    continue
+                data = resp.json()
+            except Exception as e:
+                print(f"请求错误: {location_name} {e}")
+                continue
+
+            status = data.get("status")
+            if status == 0:
+                loc = data["result"]["location"]
+                return {"lat": loc["lat"], "lng": loc["lng"]}, True
+            if status in BAIDU_RETRY_STATUS:
+                continue
+            print(f"百度地图API返回错误状态: {location_name} {data.get('msg', '无错误信息')}")
+            return None, status in BAIDU_NOT_FOUND_STATUS
+        print(f"地理编码重试 {self.max_retries} 次后仍失败: {location_name}")
+        return None, False
+
+    async def geocode_many(self, location_names):
+        """并发查询多个地名，返回 {地名: (坐标或 None, 是否可缓存)}"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits) as client:
+            async def worker(name):
+                async with semaphore:
+                    print(f"Geocoding location: {name}")
+                    return name, await self.geocode(client, name)
+
+            results = await asyncio.gather(*(worker(name) for name in location_names))
+        return dict(results)
+
+
+def run_sync(coro):
+    """在同步代码里运行协程；若当前线程已有事件循环在跑，则放到独立线程执行"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
@@ -0,0 +1,62 @@
+#把存储中的文章逐条转换成 GeoJSON Feature，并以分块的方式输出，不在内存里拼出整个 FeatureCollection。
+import orjson
+from utils.article_index import article_id
+from utils.filters import in_bbox
+
+# 每个输出块包含的 Feature 数
+GEOJSON_CHUNK_FEATURES = 500
+
+
+def article_features(article: dict, bbox=None):
+    """一篇文章的每个地点生成一个 Point Feature；bbox 之外的地点跳过"""
+    source = article.get("source") or {}
+    for loc in article.get("location") or []:
+        if not in_bbox(loc["lng"], loc["lat"], bbox):
+            continue
+        yield {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [loc["lng"], loc["lat"]]},
+            "properties": {
+                "id": article_id(article),
+                "title": article.get("title"),
+                "description": article.get("description"),
+                "url": article.get("url"),
+                "source": {"id": source.get("id"), "name": source.get("name")},
+                "publishedAt": article.get("publishedAt"),
+                "location": loc.get("location"),
+                "country": loc.get("country"),
+            },
+        }
+
+
+def iter_features(articles, bbox=None):
+    for article in articles:
+        yield from article_features(article, bbox)
+
+
+def stream_feature_collection(features, chunk_features: int = GEOJSON_CHUNK_FEATURES):
+    """输出一个完整的 FeatureCollection，每 chunk_features 个 Feature 产出一块"""
+    yield b'{"type":"FeatureCollection","features":['
+    chunk = []
+    first = True
+    for feature in features:
+        chunk.append(orjson.dumps(feature))
+        if len(chunk) >= chunk_features:
+            yield (b"" if first else b",") + b",".join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b"" if first else b",") + b",".join(chunk)
+    yield b"]}"
+
+
+def stream_ndjson(features, chunk_features: int = GEOJSON_CHUNK_FEATURES):
+    """按行输出 Feature（newline-delimited GeoJSON），客户端可以边收边画"""
+    chunk = []
+    for feature in features:
+        chunk.append(orjson.dumps(feature))
+        if len(chunk) >= chunk_features:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
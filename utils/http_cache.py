@@ -0,0 +1,35 @@
+#条件请求：由底层数据文件的版本算出强 ETag，客户端带 If-None-Match 且数据没变时直接返回 304，不再序列化响应。
+import hashlib
+from fastapi import Request, Response
+from utils.catalog import catalog
+from utils.compression import etag_in
+
+# 前端轮询时每次都向服务端确认，数据没变则只拿到一个 304
+CACHE_HEADERS = {"Cache-Control": "no-cache"}
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def dataset_etag(request: Request, filenames, articles=None, published: bytes = None) -> str:
+    """接口路径 + 查询参数 + 各数据文件的版本。
+    结果按相对当前时间的窗口筛选时再传入 articles：数据不变时窗口移动也可能改变结果，用结果的发布时间区分。
+    在列式快照上筛选时直接传入 published（以换行连接的发布时间），与传 articles 得到的 ETag 相同。"""
+    parts = [request.url.path, sorted(request.query_params.multi_items())]
+    parts.extend(catalog.version(filename) for filename in filenames)
+    if articles is not None:
+        published = "\n".join(a.get("publishedAt") or "" for a in articles).encode("utf-8")
+    if published is not None:
+        parts.append(hashlib.sha1(published).hexdigest())
+    return make_etag(*parts)
+
+
+def is_fresh(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and etag_in(etag, if_none_match)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
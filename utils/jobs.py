@@ -0,0 +1,166 @@
+#后台任务执行器：把耗时的同步任务放到线程池里跑，任务状态记在 SQLite 里，
+#多个 worker 进程（以及独立的入库进程）共用一张表：任一进程都能查到别的进程提交的任务，同名任务也不会重复提交。
+import os
+import sqlite3
+import uuid
+import asyncio
+import threading
+import traceback
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "data/jobs.sqlite3")
+# 等待其他进程里的任务结束时的轮询间隔（秒）
+WAIT_POLL_SECONDS = 0.5
+
+FIELDS = ("id", "name", "status", "created_at", "started_at", "finished_at", "error")
+ACTIVE = ("queued", "running")
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _pid_alive(pid) -> bool:
+    """Windows 上 os.kill 会直接结束进程，不做检查，一律当作存活"""
+    if pid is None or pid == os.getpid() or os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class JobManager:
+    """线程池 + 任务状态表；同名任务在排队或运行中时（无论在哪个进程）不会重复提交"""
+
+    def __init__(self, max_workers: int = 1, name: str = "jobs", keep: int = 100, path: str = JOBS_DB_PATH):
+        self.name = name
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # isolation_level=None：事务由 submit 里的 BEGIN IMMEDIATE 显式控制
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL, queue TEXT NOT NULL, "
+            "name TEXT NOT NULL, status TEXT NOT NULL, created_at TEXT, started_at TEXT, finished_at TEXT, "
+            "error TEXT, pid INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue_name ON jobs (queue, name)")
+
+    def _select(self, where: str, params=(), limit: int = None):
+        sql = f"SELECT {', '.join(FIELDS)}, pid FROM jobs WHERE queue = ? AND {where} ORDER BY seq DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._conn.execute(sql, (self.name, *params)).fetchall()
+
+    def _to_job(self, row) -> dict:
+        """进程已经退出、却还停在排队/运行中的任务记为失败"""
+        job = dict(zip(FIELDS, row[:-1]))
+        if job["status"] in ACTIVE and not _pid_alive(row[-1]):
+            job.update(status="failed", finished_at=job["finished_at"] or _now(), error="执行任务的进程已退出")
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ? AND status IN (?, ?)",
+                (job["status"], job["finished_at"], job["error"], job["id"], *ACTIVE),
+            )
+        return job
+
+    def submit(self, name: str, fn, *args, **kwargs) -> dict:
+        with self._lock:
+            # BEGIN IMMEDIATE 取得写锁，查重与插入之间其他进程不能插入同名任务
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for row in self._select("name = ? AND status IN (?, ?)", (name, *ACTIVE)):
+                    job = self._to_job(row)
+                    if job["status"] in ACTIVE:
+                        self._conn.execute("COMMIT")
+                        return job
+
+                job = dict.fromkeys(FIELDS)
+                job.update(id=uuid.uuid4().hex, name=name, status="queued", created_at=_now())
+                self._conn.execute(
+                    "INSERT INTO jobs (id, queue, name, status, created_at, pid) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job["id"], self.name, name, job["status"], job["created_at"], os.getpid()),
+                )
+                self._trim()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._futures[job["id"]] = self._executor.submit(self._run, job["id"], fn, args, kwargs)
+        return job
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._update(job_id, status="running", started_at=_now())
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", finished_at=_now(), error=str(e))
+            # 让 future 也带上原始异常，等待它的一方可以按异常类型处理
+            raise
+        else:
+            self._update(job_id, status="succeeded", finished_at=_now())
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _trim(self):
+        """只保留最近 keep 个已结束的任务"""
+        self._conn.execute(
+            "DELETE FROM jobs WHERE queue = ? AND status NOT IN (?, ?) AND seq NOT IN ("
+            "SELECT seq FROM jobs WHERE queue = ? AND status NOT IN (?, ?) ORDER BY seq DESC LIMIT ?)",
+            (self.name, *ACTIVE, self.name, *ACTIVE, self.keep),
+        )
+
+    def get(self, job_id: str):
+        with self._lock:
+            rows = self._select("id = ?", (job_id,))
+            return self._to_job(rows[0]) if rows else None
+
+    def find(self, name: str):
+        """按名称找最近提交的一个任务"""
+        with self._lock:
+            rows = self._select("name = ?", (name,), limit=1)
+            return self._to_job(rows[0]) if rows else None
+
+    def future(self, job_id: str):
+        """本进程提交的、尚未结束的任务对应的 concurrent.futures.Future；其他进程的任务返回 None"""
+        with self._lock:
+            return self._futures.get(job_id)
+
+    async def wait(self, job_id: str) -> dict:
+        """等待任务结束：本进程的任务直接等 future（失败时抛出原始异常），其他进程的任务轮询状态表"""
+        future = self.future(job_id)
+        if future is not None:
+            await asyncio.wrap_future(future)
+            return self.get(job_id)
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] not in ACTIVE:
+                break
+            await asyncio.sleep(WAIT_POLL_SECONDS)
+        if job is not None and job["status"] == "failed":
+            raise RuntimeError(job["error"])
+        return job
+
+    def list(self):
+        with self._lock:
+            return [self._to_job(row) for row in self._select("1")]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
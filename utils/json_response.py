@@ -0,0 +1,28 @@
+#orjson 响应：接口默认用 ORJSONResponse；文章列表直接拼接目录里（或列式快照里）预先编码好的字节，不再逐篇序列化。
+import orjson
+from fastapi import Response
+from utils.catalog import catalog
+
+
+class RawJSONResponse(Response):
+    """内容已经是编码好的 JSON 字节"""
+
+    media_type = "application/json"
+
+
+def articles_body(articles, **fields) -> bytes:
+    """{**fields, "articles": [...]}，字段顺序与参数顺序一致"""
+    head = orjson.dumps({**fields, "articles": []})
+    # head 以 b'[]}' 结尾，去掉 b']}' 后接上文章字节
+    return head[:-2] + b",".join(catalog.blobs(articles)) + b"]}"
+
+
+def articles_response(articles, headers=None, **fields) -> Response:
+    return RawJSONResponse(content=articles_body(articles, **fields), headers=headers)
+
+
+def selections_response(selections, headers=None, **fields) -> Response:
+    """列式快照上的筛选结果（utils.columnar.Selection 列表）按顺序拼成 {**fields, "articles": [...]}"""
+    head = orjson.dumps({**fields, "articles": []})
+    parts = [selection.body() for selection in selections if selection.count]
+    return RawJSONResponse(content=head[:-2] + b",".join(parts) + b"]}", headers=headers)
@@ -0,0 +1,84 @@
+#Mapbox Vector Tile（MVT 2.1）编码，只实现点要素：按 vector_tile.proto 直接写 protobuf，不依赖额外的包。
+import struct
+
+MVT_EXTENT = 4096
+POINT = 1
+MOVE_TO = 1
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field: int, values) -> bytes:
+    return _length_delimited(field, b"".join(_varint(v) for v in values))
+
+
+def _encode_value(value) -> bytes:
+    """Value 消息：字符串、布尔、整数、浮点各用对应字段"""
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _length_delimited(1, str(value).encode("utf-8"))
+
+
+def encode_layer(name: str, features, extent: int = MVT_EXTENT) -> bytes:
+    """features 为 [{"x": 瓦片内像素坐标, "y": ..., "properties": {...}}]，坐标范围 [0, extent)"""
+    keys, values = {}, {}
+    body = bytearray()
+    body += _length_delimited(1, name.encode("utf-8"))
+    for feature in features:
+        tags = []
+        for k, v in feature.get("properties", {}).items():
+            if v is None:
+                continue
+            tags.append(keys.setdefault(k, len(keys)))
+            tags.append(values.setdefault((type(v).__name__, v), len(values)))
+        geometry = [(1 << 3) | MOVE_TO, _zigzag(int(feature["x"])), _zigzag(int(feature["y"]))]
+        message = bytearray()
+        if tags:
+            message += _packed(2, tags)
+        message += _key(3, 0) + _varint(POINT)
+        message += _packed(4, geometry)
+        body += _length_delimited(2, bytes(message))
+    for k in keys:
+        body += _length_delimited(3, k.encode("utf-8"))
+    for _, v in values:
+        body += _length_delimited(4, _encode_value(v))
+    body += _key(5, 0) + _varint(extent)
+    body += _key(15, 0) + _varint(2)
+    return bytes(body)
+
+
+def encode_tile(layers) -> bytes:
+    """layers 为 {图层名: features}；没有要素的图层不写入"""
+    return b"".join(
+        _length_delimited(3, encode_layer(name, features))
+        for name, features in layers.items()
+        if features
+    )
@@ -0,0 +1,115 @@
+#地名规范化：把 NER 识别出的地名变体（"U.K." / "UK" / "the UK"）映射到统一写法，减少送去地理编码的不同字符串。
+#先按规范化键精确匹配，再用三元组（trigram）倒排索引取少量候选做模糊打分，结果缓存在内存里。
+import re
+import threading
+
+try:
+    from rapidfuzz import fuzz
+except ImportError:
+    from fuzzywuzzy import fuzz
+
+# 模糊匹配的最低分（0-100），与原来 extractOne 的阈值一致
+SCORE_CUTOFF = 80
+# 每个名字最多对多少个候选做模糊打分
+MAX_CANDIDATES = 10
+# 候选至少要与名字共享这个比例的三元组
+MIN_TRIGRAM_OVERLAP = 0.3
+# 太短的名字（如 "UK"）模糊匹配容易和更长的地名（"Ukraine"）互相误配，只参与精确匹配
+MIN_FUZZY_LENGTH = 4
+MEMO_MAX_SIZE = 100000
+
+_DROP = re.compile(r"[.'’]")
+_SEPARATORS = re.compile(r"[^0-9a-zÀ-￿]+")
+
+
+def normalize_key(name: str) -> str:
+    """大小写、标点和冠词无关的比较键：'U.K.' -> 'uk'，'The Hague' -> 'hague'"""
+    key = _SEPARATORS.sub(" ", _DROP.sub("", name.casefold())).strip()
+    if key.startswith("the "):
+        key = key[4:]
+    return key
+
+
+def trigrams(key: str):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlaceNormalizer:
+    """mapping 为 {地名变体: 统一写法}；统一写法本身也会被索引"""
+
+    def __init__(self, mapping: dict):
+        self._lock = threading.Lock()
+        self._memo = {}
+        # 规范化键 -> 统一写法；没有映射的名字，同一批里第一次出现的写法作为统一写法
+        self._exact = {}
+        self._surface = {}
+        self._names = []
+        self._targets = []
+        self._postings = {}
+        for variant, canonical in mapping.items():
+            self._add(variant, canonical)
+        for canonical in set(mapping.values()):
+            self._add(canonical, canonical)
+
+    def _add(self, name, canonical):
+        key = normalize_key(name)
+        if not key or key in self._exact:
+            return
+        self._exact[key] = canonical
+        if len(key) < MIN_FUZZY_LENGTH:
+            return
+        idx = len(self._names)
+        self._names.append(name)
+        self._targets.append(canonical)
+        for gram in trigrams(key):
+            self._postings.setdefault(gram, []).append(idx)
+
+    def _fuzzy(self, name, key):
+        grams = trigrams(key)
+        overlap = {}
+        for gram in grams:
+            for idx in self._postings.get(gram, ()):
+                overlap[idx] = overlap.get(idx, 0) + 1
+        min_shared = max(1, int(len(grams) * MIN_TRIGRAM_OVERLAP))
+        candidates = sorted(
+            (idx for idx, shared in overlap.items() if shared >= min_shared),
+            key=lambda idx: overlap[idx], reverse=True,
+        )[:MAX_CANDIDATES]
+
+        best, best_score = None, SCORE_CUTOFF - 1
+        for idx in candidates:
+            score = fuzz.WRatio(name, self._names[idx])
+            if score > best_score:
+                best, best_score = self._targets[idx], score
+        return best
+
+    def _resolve(self, name):
+        key = normalize_key(name)
+        if not key:
+            return name
+        canonical = self._exact.get(key)
+        if canonical is None and len(key) >= MIN_FUZZY_LENGTH:
+            canonical = self._fuzzy(name, key)
+        if canonical is None:
+            # 映射表里没有：大小写/标点不同的写法统一成第一次见到的那个
+            canonical = self._surface.setdefault(key, name)
+        return canonical
+
+    def normalize(self, name: str) -> str:
+        return self.normalize_many([name])[name]
+
+    def normalize_many(self, names) -> dict:
+        """批量规范化，返回 {原名: 统一写法}"""
+        results = {}
+        with self._lock:
+            for name in names:
+                if name in results:
+                    continue
+                canonical = self._memo.get(name)
+                if canonical is None:
+                    if len(self._memo) >= MEMO_MAX_SIZE:
+                        self._memo.clear()
+                    canonical = self._memo[name] = self._resolve(name)
+                results[name] = canonical
+        return results
@@ -0,0 +1,226 @@
+#文章地点的分级网格聚类索引：每个缩放级别把地图按 radius 像素划分网格，格子里累计点数、坐标和与最新的几篇文章 id。
+#查询只访问视野内的格子，返回的聚类数取决于视野像素而不是数据量；入库时按新文章增量累加，压缩后整体重建。
+import os
+import math
+import threading
+from utils.article_index import article_id
+from utils.article_store import parse_published_at, list_datasets
+from utils.catalog import catalog
+
+CATEGORY_FOLDER = "data/top-headlines/category"
+CLUSTER_RADIUS_PX = int(os.getenv("CLUSTER_RADIUS_PX", 64))
+CLUSTER_MAX_ZOOM = int(os.getenv("CLUSTER_MAX_ZOOM", 16))
+# 单次查询的视野最大像素边长；超过时说明 bbox 与缩放级别不匹配，拒绝查询以保证响应大小有上限
+CLUSTER_MAX_VIEWPORT_PX = 8192
+# 每个聚类带回的代表文章数（按发布时间取最新）
+CLUSTER_SAMPLE_IDS = 3
+MAX_LAT = 85.05112878
+
+
+def mercator(lng: float, lat: float):
+    """经纬度 -> [0, 1) 区间的 Web 墨卡托坐标"""
+    lat = min(max(lat, -MAX_LAT), MAX_LAT)
+    sin_lat = math.sin(math.radians(lat))
+    x = (lng + 180.0) / 360.0
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x % 1.0, min(max(y, 0.0), 1.0 - 1e-12)
+
+
+def inverse_mercator(x: float, y: float):
+    lng = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lng, lat
+
+
+def _column(lng: float, n: int, upper: bool = False) -> int:
+    """经度所在的网格列，经度先折算到 [-180, 180)；upper 时 180° 算作最后一列"""
+    t = (lng + 180.0) / 360.0
+    frac = t % 1.0
+    if upper and frac == 0.0 and t != 0:
+        frac = 1.0 - 1e-12
+    return min(int(frac * n), n - 1)
+
+
+class GridClusterIndex:
+    """一组点的分级网格；第 z 级每个轴有 2^z * 256 / radius 个格子。
+    格子是 [点数, x 之和, y 之和, 代表文章]，代表文章为 [(发布时间戳, 文章 id)]，按时间从新到旧。"""
+
+    def __init__(self, radius: int = CLUSTER_RADIUS_PX, max_zoom: int = CLUSTER_MAX_ZOOM,
+                 sample_size: int = CLUSTER_SAMPLE_IDS):
+        self.radius = radius
+        self.max_zoom = max_zoom
+        self.sample_size = sample_size
+        self.levels = [{} for _ in range(max_zoom + 1)]
+        self._axis = [self.cells_per_axis(zoom) for zoom in range(max_zoom + 1)]
+        self.points = 0
+
+    def cells_per_axis(self, zoom: int) -> int:
+        return max(1, (256 << zoom) // self.radius)
+
+    def add_point(self, lng, lat, ts, aid):
+        x, y = mercator(lng, lat)
+        sample = (ts, aid)
+        size = self.sample_size
+        for level, n in zip(self.levels, self._axis):
+            key = (int(x * n), int(y * n))
+            cell = level.get(key)
+            if cell is None:
+                level[key] = [1, x, y, [sample]]
+                continue
+            cell[0] += 1
+            cell[1] += x
+            cell[2] += y
+            samples = cell[3]
+            if sample not in samples and (len(samples) < size or ts > samples[-1][0]):
+                samples.append(sample)
+                samples.sort(reverse=True)
+                del samples[size:]
+        self.points += 1
+
+    def add_articles(self, articles):
+        for article in articles:
+            pub_time = parse_published_at(article)
+            ts = pub_time.timestamp() if pub_time else 0.0
+            aid = article_id(article)
+            for loc in article.get("location") or []:
+                self.add_point(loc["lng"], loc["lat"], ts, aid)
+
+    def cells(self, zoom: int, bbox):
+        """视野内的 ((cx, cy), 格子)；bbox 为 (minLng, minLat, maxLng, maxLat)，minLng > maxLng 表示跨越 180° 经线"""
+        zoom = min(max(zoom, 0), self.max_zoom)
+        n = self.cells_per_axis(zoom)
+        min_lng, min_lat, max_lng, max_lat = bbox
+        # 纬度大的一侧在墨卡托 y 上更小
+        _, y0 = mercator(0, max_lat)
+        _, y1 = mercator(0, min_lat)
+        cy0, cy1 = int(y0 * n), int(y1 * n)
+        if max_lng - min_lng >= 360:
+            x_ranges = [(0, n - 1)]
+        else:
+            cx0, cx1 = _column(min_lng, n), _column(max_lng, n, upper=True)
+            x_ranges = [(cx0, cx1)] if cx0 <= cx1 else [(cx0, n - 1), (0, cx1)]
+
+        area = sum(x1 - x0 + 1 for x0, x1 in x_ranges) * (cy1 - cy0 + 1)
+        max_cells = (CLUSTER_MAX_VIEWPORT_PX // self.radius + 2) ** 2
+        if area > max_cells:
+            raise ValueError(f"bbox 在缩放级别 {zoom} 下超过 {CLUSTER_MAX_VIEWPORT_PX}px，请缩小范围或降低缩放级别")
+        return self.cells_in_ranges(zoom, x_ranges, cy0, cy1)
+
+    def tile_cells(self, z: int, x: int, y: int):
+        """XYZ 瓦片覆盖的格子；z 超过 max_zoom 时用最细一级的格子"""
+        zoom = min(max(z, 0), self.max_zoom)
+        n = self.cells_per_axis(zoom)
+        cx0, cx1 = (x * n) >> z, ((x + 1) * n - 1) >> z
+        cy0, cy1 = (y * n) >> z, ((y + 1) * n - 1) >> z
+        return self.cells_in_ranges(zoom, [(cx0, cx1)], cy0, cy1)
+
+    def cells_in_ranges(self, zoom: int, x_ranges, cy0: int, cy1: int):
+        level = self.levels[zoom]
+        area = sum(x1 - x0 + 1 for x0, x1 in x_ranges) * (cy1 - cy0 + 1)
+        if area <= len(level):
+            # 范围内格子不多：逐格查表
+            for x0, x1 in x_ranges:
+                for cx in range(x0, x1 + 1):
+                    for cy in range(cy0, cy1 + 1):
+                        cell = level.get((cx, cy))
+                        if cell is not None:
+                            yield (cx, cy), cell
+        else:
+            # 非空格子比范围内格子少：遍历非空格子
+            for (cx, cy), cell in level.items():
+                if cy0 <= cy <= cy1 and any(x0 <= cx <= x1 for x0, x1 in x_ranges):
+                    yield (cx, cy), cell
+
+
+class ClusterIndex:
+    """每个类别一份网格索引；第一次查询时从存储构建，之后由入库增量更新"""
+
+    def __init__(self, folder: str = CATEGORY_FOLDER, radius: int = CLUSTER_RADIUS_PX,
+                 max_zoom: int = CLUSTER_MAX_ZOOM, name: str = "聚类索引"):
+        self.folder = folder
+        self.radius = radius
+        self.max_zoom = max_zoom
+        self.name = name
+        self._indexes = None
+        self._lock = threading.Lock()
+
+    def _new_index(self):
+        return GridClusterIndex(radius=self.radius, max_zoom=self.max_zoom)
+
+    def _build(self):
+        indexes = {}
+        for category in list_datasets(self.folder):
+            index = self._new_index()
+            index.add_articles(catalog.load_articles(os.path.join(self.folder, category + ".json")))
+            indexes[category] = index
+        print(f"{self.name}已构建：{sum(index.points for index in indexes.values())} 个地点")
+        return indexes
+
+    def _ensure(self):
+        with self._lock:
+            if self._indexes is None:
+                self._indexes = self._build()
+            return self._indexes
+
+    def add(self, category: str, articles):
+        """入库后调用：新文章的地点累加进对应类别的索引"""
+        with self._lock:
+            if self._indexes is None:
+                # 还没构建过，第一次查询时会从存储完整构建
+                return
+            index = self._indexes.get(category)
+            if index is None:
+                index = self._indexes[category] = self._new_index()
+            index.add_articles(articles)
+
+    def invalidate(self):
+        """压缩去重之后调用，下次查询时重建"""
+        with self._lock:
+            self._indexes = None
+
+    def _merge(self, zoom: int, category, cells_of):
+        """合并所选类别在同一格子上的计数；category 为空时合并所有类别"""
+        indexes = self._ensure()
+        with self._lock:
+            if category and category not in indexes:
+                return []
+            selected = [indexes[category]] if category else list(indexes.values())
+            merged = {}
+            for index in selected:
+                for key, (count, sum_x, sum_y, samples) in cells_of(index):
+                    entry = merged.get(key)
+                    if entry is None:
+                        merged[key] = [count, sum_x, sum_y, list(samples)]
+                    else:
+                        entry[0] += count
+                        entry[1] += sum_x
+                        entry[2] += sum_y
+                        entry[3].extend(samples)
+
+        clusters = []
+        zoom = min(max(zoom, 0), self.max_zoom)
+        for (cx, cy), (count, sum_x, sum_y, samples) in merged.items():
+            x, y = sum_x / count, sum_y / count
+            lng, lat = inverse_mercator(x, y)
+            article_ids = list(dict.fromkeys(aid for _, aid in sorted(samples, reverse=True)))[:CLUSTER_SAMPLE_IDS]
+            clusters.append({
+                "id": f"{zoom}/{cx}/{cy}",
+                "x": x,
+                "y": y,
+                "lng": lng,
+                "lat": lat,
+                "count": count,
+                "article_ids": article_ids,
+            })
+        return clusters
+
+    def query(self, bbox, zoom: int, category: str = None):
+        """返回视野内的聚类列表，x/y 为聚类中心的墨卡托坐标"""
+        return self._merge(zoom, category, lambda index: index.cells(zoom, bbox))
+
+    def query_tile(self, z: int, x: int, y: int, category: str = None):
+        """返回 XYZ 瓦片覆盖范围内的聚类列表"""
+        return self._merge(z, category, lambda index: index.tile_cells(z, x, y))
+
+
+cluster_index = ClusterIndex()
@@ -0,0 +1,85 @@
+#不依赖浏览器的地图导出：直接用 Pillow 拼接 XYZ 瓦片并绘制点位，瓦片通过本地瓦片缓存读取。
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageDraw
+from utils.tile_cache import tile_cache, TILE_SOURCES
+
+TILE_SIZE = 256
+TILE_FETCH_WORKERS = 8
+DEFAULT_BASEMAP = "OpenStreetMap"
+
+MISSING_TILE_COLOR = (221, 221, 221)
+POINT_COLOR = (51, 136, 255)
+POINT_OUTLINE = (255, 255, 255)
+POINT_RADIUS = 6
+
+
+def project(lats, lngs, zoom: int):
+    """经纬度数组 -> Web 墨卡托下的全局像素坐标（向量化）"""
+    scale = TILE_SIZE * (2 ** zoom)
+    lats = np.clip(np.asarray(lats, dtype=float), -85.05112878, 85.05112878)
+    lngs = np.asarray(lngs, dtype=float)
+    x = (lngs + 180.0) / 360.0 * scale
+    sin_lat = np.sin(np.radians(lats))
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def load_tile(basemap: str, z: int, x: int, y: int):
+    """从瓦片缓存读取一张瓦片，拿不到返回 None"""
+    content = tile_cache.get(basemap, z, x, y)
+    if content is None:
+        return None
+    try:
+        return Image.open(io.BytesIO(content)).convert("RGB")
+    except Exception as e:
+        print(f"解析瓦片失败 {basemap}/{z}/{x}/{y}: {e}")
+        return None
+
+
+def render_map_image(center_lat: float, center_lng: float, zoom: int, width: int, height: int,
+                     points, basemap: str = DEFAULT_BASEMAP) -> Image.Image:
+    """拼接覆盖视野的瓦片并画出点位，points 为 [(lng, lat), ...]（GeoJSON 坐标顺序）"""
+    if basemap not in TILE_SOURCES:
+        basemap = DEFAULT_BASEMAP
+    (center_x,), (center_y,) = project([center_lat], [center_lng], zoom)
+    left = center_x - width / 2
+    top = center_y - height / 2
+    tiles_per_axis = 2 ** zoom
+
+    tile_x0, tile_x1 = math.floor(left / TILE_SIZE), math.floor((left + width - 1) / TILE_SIZE)
+    tile_y0, tile_y1 = math.floor(top / TILE_SIZE), math.floor((top + height - 1) / TILE_SIZE)
+    wanted = [
+        (tx, ty)
+        for ty in range(tile_y0, tile_y1 + 1)
+        for tx in range(tile_x0, tile_x1 + 1)
+        if 0 <= ty < tiles_per_axis
+    ]
+
+    # 经度方向按世界宽度取模，跨越 180° 经线时也能取到正确的瓦片
+    with ThreadPoolExecutor(max_workers=TILE_FETCH_WORKERS) as pool:
+        tiles = pool.map(lambda t: load_tile(basemap, zoom, t[0] % tiles_per_axis, t[1]), wanted)
+
+    image = Image.new("RGB", (width, height), MISSING_TILE_COLOR)
+    for (tx, ty), tile in zip(wanted, tiles):
+        if tile is not None:
+            image.paste(tile, (int(round(tx * TILE_SIZE - left)), int(round(ty * TILE_SIZE - top))))
+
+    if points:
+        coords = np.asarray(points, dtype=float)
+        xs, ys = project(coords[:, 1], coords[:, 0], zoom)
+        world = TILE_SIZE * tiles_per_axis
+        # 把点平移到离视野中心最近的那一个“世界副本”上
+        xs = xs - np.round((xs - center_x) / world) * world
+        px = xs - left
+        py = ys - top
+        visible = (px >= -POINT_RADIUS) & (px < width + POINT_RADIUS) & (py >= -POINT_RADIUS) & (py < height + POINT_RADIUS)
+        draw = ImageDraw.Draw(image)
+        for x, y in zip(px[visible], py[visible]):
+            draw.ellipse(
+                (x - POINT_RADIUS, y - POINT_RADIUS, x + POINT_RADIUS, y + POINT_RADIUS),
+                fill=POINT_COLOR, outline=POINT_OUTLINE, width=2,
+            )
+    return image
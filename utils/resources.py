@@ -0,0 +1,76 @@
+#重资源注册表：spaCy 模型、地理编码客户端、NewsAPI key 等在第一次用到时才初始化，进程内共享一份。
+#只读模式（READ_ONLY=true）下只提供查询接口，入库才需要的资源不会被加载。
+import os
+import threading
+import time
+
+READ_ONLY = os.getenv("READ_ONLY", "false").lower() == "true"
+# 启动后在后台预先初始化的资源，逗号分隔，例如 nlp,geocoder
+WARMUP_RESOURCES = [name.strip() for name in os.getenv("WARMUP_RESOURCES", "").split(",") if name.strip()]
+
+
+class ReadOnlyError(RuntimeError):
+    """只读模式下请求了入库才需要的资源"""
+
+
+class ResourceRegistry:
+    def __init__(self, read_only: bool = READ_ONLY):
+        self.read_only = read_only
+        self._factories = {}
+        self._instances = {}
+        self._load_seconds = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory, ingest: bool = False):
+        """factory 无参数，返回资源对象；ingest=True 表示只有入库才需要，只读模式下不允许加载"""
+        with self._lock:
+            self._factories[name] = (factory, ingest)
+            self._locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        factory, ingest = self._factories[name]
+        if ingest and self.read_only:
+            raise ReadOnlyError(f"只读模式下不加载 {name}")
+        # 每个资源一把锁：并发的第一次调用只初始化一次，不同资源互不阻塞
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                instance = factory()
+                self._load_seconds[name] = time.perf_counter() - start
+                self._instances[name] = instance
+                print(f"资源 {name} 已初始化，用时 {self._load_seconds[name]:.2f}s")
+        return instance
+
+    def warmup(self, names=None):
+        """预先初始化资源，失败只打印不抛出；只读模式下跳过入库资源"""
+        for name in WARMUP_RESOURCES if names is None else names:
+            if name not in self._factories:
+                print(f"未知的预热资源: {name}")
+                continue
+            if self._factories[name][1] and self.read_only:
+                continue
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"预热资源 {name} 失败: {e}")
+
+    def stats(self):
+        return {
+            "read_only": self.read_only,
+            "resources": {
+                name: {
+                    "loaded": name in self._instances,
+                    "ingest": ingest,
+                    "load_seconds": self._load_seconds.get(name),
+                }
+                for name, (_, ingest) in self._factories.items()
+            },
+        }
+
+
+resources = ResourceRegistry()
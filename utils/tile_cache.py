@@ -0,0 +1,197 @@
+#底图瓦片磁盘缓存：按 (图层, z, x, y) 存文件，总大小超过上限时按最近最少使用淘汰。
+#目录结构: {TILE_CACHE_DIR}/{图层}/{z}/{x}/{y}.png，文件 mtime 记录最近访问时间，重启后据此恢复 LRU 顺序。
+#多个 worker 共用同一个目录：各进程定期重新扫描目录，按目录的实际大小淘汰，总量不会变成上限的若干倍。
+import os
+import time
+import threading
+from collections import OrderedDict
+import requests
+
+TILE_CACHE_DIR = os.getenv("TILE_CACHE_DIR", "data/tiles")
+TILE_CACHE_MAX_MB = float(os.getenv("TILE_CACHE_MAX_MB", 512))
+# 为 true 时只使用已缓存的瓦片，不访问上游
+TILE_CACHE_OFFLINE = os.getenv("TILE_CACHE_OFFLINE", "false").lower() in ("1", "true", "yes")
+TILE_USER_AGENT = "ednews-map-export/1.0"
+# 命中时最多每隔多少秒更新一次文件 mtime，避免每次读取都写元数据
+TOUCH_INTERVAL = 3600
+# 写入新瓦片时最多每隔多少秒重新扫描一次目录，把其他进程写入的瓦片计入总大小
+TILE_CACHE_SCAN_SECONDS = float(os.getenv("TILE_CACHE_SCAN_SECONDS", 60))
+
+# 图层名 -> 上游 XYZ 地址模板；与 /map/basemap-types 中的底图名称对应，GeoServer 图层由 layers.py 注册
+TILE_SOURCES = {
+    "OpenStreetMap": "https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+    "CartoDB positron": "https://a.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png",
+    "CartoDB dark_matter": "https://a.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}.png",
+    "Stamen Terrain": "https://tiles.stadiamaps.com/tiles/stamen_terrain/{z}/{x}/{y}.png",
+    "Stamen Toner": "https://tiles.stadiamaps.com/tiles/stamen_toner/{z}/{x}/{y}.png",
+}
+
+
+def register_source(layer: str, url_template: str):
+    TILE_SOURCES[layer] = url_template
+
+
+class TileCache:
+    def __init__(self, root: str = TILE_CACHE_DIR, max_bytes: int = int(TILE_CACHE_MAX_MB * 1024 * 1024),
+                 offline: bool = TILE_CACHE_OFFLINE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.upstream_errors = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_scan = 0.0
+        self._scanning = False
+        self._session = requests.Session()
+        self._session.headers["User-Agent"] = TILE_USER_AGENT
+        self._scan()
+
+    def _path(self, layer, z, x, y):
+        return os.path.join(self.root, layer.replace(" ", "_"), str(z), str(x), f"{y}.png")
+
+    def _scan(self):
+        """扫描缓存目录（启动时和定期），按 mtime 从旧到新排好 LRU 顺序，总大小以目录实际内容为准"""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".png"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    found.append((st.st_mtime, path, st.st_size))
+        entries = OrderedDict()
+        total_bytes = 0
+        for mtime, path, size in sorted(found):
+            entries[path] = [size, mtime]
+            total_bytes += size
+        with self._lock:
+            # 本进程内记录的访问时间可能比文件 mtime 新（touch 有间隔），以较新的为准
+            for path, entry in self._entries.items():
+                if path in entries and entry[1] > entries[path][1]:
+                    entries[path][1] = entry[1]
+            self._entries = OrderedDict(sorted(entries.items(), key=lambda item: item[1][1]))
+            self.total_bytes = total_bytes
+            self._last_scan = time.time()
+            self._evict()
+
+    def _maybe_rescan(self):
+        """超出上限或距上次扫描已久时重新扫描；同一时间只有一个线程扫描"""
+        with self._lock:
+            due = self.total_bytes > self.max_bytes or time.time() - self._last_scan > TILE_CACHE_SCAN_SECONDS
+            if not due or self._scanning:
+                return
+            self._scanning = True
+        try:
+            self._scan()
+        finally:
+            with self._lock:
+                self._scanning = False
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            path, (size, _) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _read_cached(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                entry = self._adopt(path)
+            if entry is None:
+                return None
+            self._entries.move_to_end(path)
+            now = time.time()
+            touch = now - entry[1] > TOUCH_INTERVAL
+            if touch:
+                entry[1] = now
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            if touch:
+                os.utime(path, (now, now))
+            return content
+        except FileNotFoundError:
+            with self._lock:
+                entry = self._entries.pop(path, None)
+                if entry:
+                    self.total_bytes -= entry[0]
+            return None
+
+    def _adopt(self, path):
+        """索引里没有、但其他进程已经写入磁盘的瓦片，加入本进程的索引"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self._entries[path] = [st.st_size, st.st_mtime]
+        self.total_bytes += st.st_size
+        return entry
+
+    def _store(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old:
+                self.total_bytes -= old[0]
+            self._entries[path] = [len(content), time.time()]
+            self.total_bytes += len(content)
+        # 不在这里直接按本进程的计数淘汰：先重新扫描目录，其他进程写入的瓦片也算在内
+        self._maybe_rescan()
+
+    def get(self, layer: str, z: int, x: int, y: int):
+        """返回瓦片的字节内容；缓存没有时从上游获取并写入缓存，拿不到返回 None"""
+        path = self._path(layer, z, x, y)
+        content = self._read_cached(path)
+        if content is not None:
+            with self._lock:
+                self.hits += 1
+            return content
+
+        with self._lock:
+            self.misses += 1
+        template = TILE_SOURCES.get(layer)
+        if self.offline or template is None:
+            return None
+        url = template.format(z=z, x=x, y=y)
+        try:
+            resp = self._session.get(url, timeout=10)
+            resp.raise_for_status()
+        except Exception as e:
+            with self._lock:
+                self.upstream_errors += 1
+            print(f"下载瓦片失败 {url}: {e}")
+            return None
+        self._store(path, resp.content)
+        return resp.content
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "tiles": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "upstream_errors": self.upstream_errors,
+                "evictions": self.evictions,
+            }
+
+
+tile_cache = TileCache()
@@ -1,33 +1,40 @@
-import spacy
-import requests
 import os
 import ast
 import json
-import requests
-import time
-from random import randrange
-from fuzzywuzzy import process
-
-nlp = spacy.load("en_core_web_sm")
-ruler = nlp.add_pipe("entity_ruler", before="ner")
-patterns = [
-    {"label": "GPE", "pattern": "U.S."},
-    {"label": "GPE", "pattern": "USA"},
-    {"label": "GPE", "pattern": "United States"},
-    {"label": "NORP", "pattern": "European"},
-]
-ruler.add_patterns(patterns)
-
-raw_keys = os.getenv("geocoding_api_key")
-BAIDU_MAP_AK = raw_keys.split(",") if raw_keys else []
-if not BAIDU_MAP_AK:
-    raise ValueError("⚠️ 没有找到 geocoding_api_key，请确认 .env 已正确加载")
-LAST_KEY_INDEX = randrange(0, len(BAIDU_MAP_AK))
-def get_key():
-    """获取下一个 API 密钥"""
-    global LAST_KEY_INDEX
-    LAST_KEY_INDEX = (LAST_KEY_INDEX + 1) % len(BAIDU_MAP_AK)
-    return BAIDU_MAP_AK[LAST_KEY_INDEX]
+from utils.geocode_cache import geocode_cache, MISSING
+from utils.gazetteer import gazetteer
+from utils.geocoder import AsyncBaiduGeocoder, run_sync
+from utils.place_normalizer import PlaceNormalizer
+from utils.resources import resources
+
+def load_nlp():
+    # spaCy 本身导入就要约 1 秒，只在第一次识别地名时导入和加载模型
+    import spacy
+
+    nlp = spacy.load("en_core_web_sm")
+    ruler = nlp.add_pipe("entity_ruler", before="ner")
+    patterns = [
+        {"label": "GPE", "pattern": "U.S."},
+        {"label": "GPE", "pattern": "USA"},
+        {"label": "GPE", "pattern": "United States"},
+        {"label": "NORP", "pattern": "European"},
+    ]
+    ruler.add_patterns(patterns)
+    return nlp
+
+def load_geocoder():
+    raw_keys = os.getenv("geocoding_api_key")
+    baidu_map_ak = raw_keys.split(",") if raw_keys else []
+    if not baidu_map_ak:
+        raise ValueError("⚠️ 没有找到 geocoding_api_key，请确认 .env 已正确加载")
+    # 所有 key 共用一个客户端，按每个 key 的配额并发请求
+    return AsyncBaiduGeocoder(baidu_map_ak)
+
+resources.register("nlp", load_nlp, ingest=True)
+resources.register("geocoder", load_geocoder, ingest=True)
+
+def get_nlp():
+    return resources.get("nlp")
 
 #表1
 manual_coords_mapping='data/manual_coords_mapping.json'
@@ -45,66 +52,106 @@ try:
 except Exception as e:
     print(f"加载映射文件失败: {e}")
     location_mapping = {}
-all_reference_names = list(location_mapping.keys())
+# 映射表建好索引，精确匹配不上时再做模糊匹配，结果缓存
+place_normalizer = PlaceNormalizer(location_mapping)
 
 def smart_map_location(raw_location_name):
-    if raw_location_name in location_mapping:
-        return location_mapping[raw_location_name]
+    return place_normalizer.normalize(raw_location_name)
 
-    best_match, score = process.extractOne(raw_location_name, all_reference_names)
-    if score >= 80:
-        return location_mapping[best_match]
+def geocode_locations(location_names):
+    """批量地理编码：手动映射 -> 离线地名表 -> 缓存 -> 并发请求百度接口，返回 {地名: 坐标或 None}。
+    None 表示确定查不到；请求失败、限流等临时错误的地名不在结果里，下次入库时再查"""
+    results = {}
+    pending = []
+    for name in set(location_names):
+        if name in manual_coords_mapping:
+            print(f"使用手动经纬度: {name}")
+            results[name] = manual_coords_mapping[name]
+            continue
+        coords = gazetteer.lookup(name)
+        if coords is not None:
+            results[name] = coords
+            continue
+        cached = geocode_cache.get(name)
+        if cached is not MISSING:
+            results[name] = cached
+        else:
+            pending.append(name)
 
-    print(f"警告: 地名 '{raw_location_name}' 未匹配，建议加入映射表")
-    return raw_location_name
+    if pending:
+        for name, (coords, cacheable) in run_sync(resources.get("geocoder").geocode_many(pending)).items():
+            if cacheable:
+                geocode_cache.set(name, coords)
+                results[name] = coords
+    return results
 
 def geocode_location(location_name: str):
-    if location_name in manual_coords_mapping:
-        print(f"使用手动经纬度: {location_name}")
-        return manual_coords_mapping[location_name]
-    
-    url = "http://api.map.baidu.com/geocoding/v3/"
-    params = {
-        "address": location_name,
-        "output": "json",
-        "ak": get_key(),
-    }
-    print(f"Geocoding location: {location_name}")
-    time.sleep(1)
-    try:
-        resp = requests.get(url, params=params, timeout=5)
-        data = resp.json()
-        if data.get("status") == 0:
-            loc = data["result"]["location"]
-            return {"lat": loc["lat"], "lng": loc["lng"]}
-        else:
-            print(f"百度地图API返回错误状态: {data.get('msg', '无错误信息')}")
-    except Exception as e:
-        print(f"请求错误: {e}")
-    return None
+    return geocode_locations([location_name]).get(location_name)
+
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", 64))
+NER_N_PROCESS = int(os.getenv("NER_N_PROCESS", 1))
+# 只需要 doc.ents，tagger/parser/lemmatizer 等组件全部跳过
+NER_PIPES = {"entity_ruler", "ner"}
+LOCATION_LABELS = {"GPE", "NORP"}
+
+def extract_location_names(texts, batch_size=NER_BATCH_SIZE, n_process=NER_N_PROCESS):
+    """用 nlp.pipe 批量识别地名，返回与 texts 一一对应的地名集合列表"""
+    nlp = get_nlp()
+    disabled = [name for name in nlp.pipe_names if name not in NER_PIPES]
+    return [
+        set(ent.text for ent in doc.ents if ent.label_ in LOCATION_LABELS)
+        for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disabled)
+    ]
 
 def add_location_info(articles):
-    new_articles = []
+    """识别地名并编码，返回 (带地点的文章, 因地理编码临时失败而暂不能确定的文章)；
+    后者没有保存，也不应登记为已处理，下次入库时重新识别"""
+    candidates = []
+    texts = []
     for article in articles:
         title = article.get("title", "")
         description = article.get("description", "")
         combined_text = f"{title} {description}".strip()
         if not combined_text:
             continue
+        candidates.append(article)
+        texts.append(combined_text)
 
-        doc = nlp(combined_text)
-        loc_texts = set(ent.text for ent in doc.ents if ent.label_ in {"GPE", "NORP"})
-
-        normalized_locs = set(location_mapping.get(loc, loc) for loc in loc_texts)
+    raw_locs = extract_location_names(texts)
+    # 所有文章的地名一次性规范化，写法不同的同一地点只编码一次
+    normalized = place_normalizer.normalize_many(set().union(*raw_locs))
+    article_locs = [set(normalized[loc] for loc in loc_texts) for loc_texts in raw_locs]
+    coords_by_name = geocode_locations(set().union(*article_locs))
 
+    new_articles = []
+    unresolved = []
+    for article, normalized_locs in zip(candidates, article_locs):
         loc_infos = []
         for loc in normalized_locs:
-            coords = geocode_location(loc)
+            coords = coords_by_name.get(loc)
             if coords:
                 loc_infos.append({"location": loc, **coords})
 
         if loc_infos:
             article["location"] = loc_infos
             new_articles.append(article)
+        elif any(loc not in coords_by_name for loc in normalized_locs):
+            unresolved.append(article)
+
+    annotate_countries([loc for article in new_articles for loc in article["location"]])
+    return new_articles, unresolved
 
-    return new_articles
\ No newline at end of file
+def annotate_countries(loc_infos):
+    """入库时把所属国家写进每个地点，图表统计时不用再做空间判断"""
+    if not loc_infos:
+        return
+    # 国家边界依赖 geopandas，只在入库时才导入，只读的 worker 不加载
+    from utils.countries import lookup_countries
+    try:
+        countries = lookup_countries([(loc["lat"], loc["lng"]) for loc in loc_infos])
+    except Exception as e:
+        print(f"判断地点所属国家失败，跳过: {e}")
+        return
+    for loc, country in zip(loc_infos, countries):
+        if country is not None:
+            loc["country"] = country
@@ -0,0 +1,104 @@
+#新闻地点矢量瓦片：按瓦片从细网格索引取出点（每个小格子只保留一个点，完成抽稀），编码为 MVT 并放进 LRU 缓存。
+#入库时只淘汰新文章所在位置的瓦片，其余缓存继续有效。
+import os
+import threading
+from collections import OrderedDict
+from utils.mvt import encode_tile, MVT_EXTENT
+from utils.point_clusters import ClusterIndex, mercator
+
+NEWS_LAYER = "news"
+# 抽稀网格边长（瓦片像素，瓦片为 256 像素），每个格子输出一个点
+MVT_THIN_PX = int(os.getenv("MVT_THIN_PX", 8))
+MVT_MAX_ZOOM = int(os.getenv("MVT_MAX_ZOOM", 16))
+MVT_CACHE_TILES = int(os.getenv("MVT_CACHE_TILES", 4096))
+# 淘汰缓存时考虑的最大缩放级别（Leaflet/Mapbox 常用上限）
+MAX_TILE_ZOOM = 22
+
+
+class VectorTileService:
+    def __init__(self, thin_px: int = MVT_THIN_PX, max_zoom: int = MVT_MAX_ZOOM, cache_tiles: int = MVT_CACHE_TILES):
+        self.index = ClusterIndex(radius=thin_px, max_zoom=max_zoom, name="矢量瓦片索引")
+        self.cache_tiles = cache_tiles
+        self.hits = 0
+        self.misses = 0
+        # 每次入库或重建加一；渲染期间发生过写入的瓦片不放进缓存
+        self._generation = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _render(self, z: int, x: int, y: int, category):
+        scale = 1 << z
+        features = []
+        for cluster in self.index.query_tile(z, x, y, category):
+            px = (cluster["x"] * scale - x) * MVT_EXTENT
+            py = (cluster["y"] * scale - y) * MVT_EXTENT
+            if not (0 <= px < MVT_EXTENT and 0 <= py < MVT_EXTENT):
+                # 缩放级别超过索引最细一级时，格子中心可能落在瓦片外
+                continue
+            features.append({
+                "x": px,
+                "y": py,
+                "properties": {
+                    "count": cluster["count"],
+                    "article_id": cluster["article_ids"][0] if cluster["article_ids"] else None,
+                },
+            })
+        return encode_tile({NEWS_LAYER: features})
+
+    def get_tile(self, z: int, x: int, y: int, category: str = None) -> bytes:
+        """编码好的 MVT；瓦片内没有点时返回空字节串"""
+        key = (category, z, x, y)
+        with self._lock:
+            content = self._cache.get(key)
+            if content is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return content
+            self.misses += 1
+            generation = self._generation
+
+        content = self._render(z, x, y, category)
+        with self._lock:
+            if generation != self._generation:
+                return content
+            self._cache[key] = content
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_tiles:
+                self._cache.popitem(last=False)
+        return content
+
+    def add(self, category: str, articles):
+        """入库后调用：更新索引，并淘汰覆盖新地点的瓦片（本类别和不分类别的）"""
+        self.index.add(category, articles)
+        covering = set()
+        for article in articles:
+            for loc in article.get("location") or []:
+                mx, my = mercator(loc["lng"], loc["lat"])
+                for z in range(MAX_TILE_ZOOM + 1):
+                    covering.add((z, int(mx * (1 << z)), int(my * (1 << z))))
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._cache if key[0] in (None, category) and key[1:] in covering]
+            for key in stale:
+                del self._cache[key]
+
+    def invalidate(self):
+        """压缩去重之后调用：索引重建，缓存全部作废"""
+        self.index.invalidate()
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "tiles": len(self._cache),
+                "max_tiles": self.cache_tiles,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+vector_tiles = VectorTileService()